@@ -0,0 +1,149 @@
+"""
+Process-wide asset cache with a memory budget
+
+Screens, the sprite loader and the room client used to load and keep their
+own copies of the same images (Home.jpg alone was scaled five times) and
+never let go of a character once loaded. AssetManager keeps one copy of
+each asset by key, e.g. ('image', path, size, alpha), counts the pixel
+bytes it holds and drops the least recently used entries once the total
+passes the budget. Anything still in use keeps its surfaces alive; the
+manager only stops holding them.
+
+The budget defaults to DEFAULT_BUDGET_MB and can be set with the
+SF_ASSET_BUDGET_MB environment variable, e.g. for low-memory kiosks.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import pygame
+
+from image_cache import load_image
+
+DEFAULT_BUDGET_MB = 256
+
+
+def asset_bytes(value, seen=None):
+    """Pixel bytes held by a surface or a structure of surfaces
+
+    Subsurfaces count their parent surface once, so an atlas and its frames
+    weigh as much as the atlas.
+    """
+    if seen is None:
+        seen = set()
+    if isinstance(value, pygame.Surface):
+        base = value.get_abs_parent()
+        if id(base) in seen:
+            return 0
+        seen.add(id(base))
+        return base.get_pitch() * base.get_height()
+    if isinstance(value, dict):
+        return sum(asset_bytes(item, seen) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(asset_bytes(item, seen) for item in value)
+    if hasattr(value, '__dict__'):
+        return asset_bytes(vars(value), seen)
+    return 0
+
+
+def image_key(path, size=None, alpha=False):
+    """Key AssetManager.image() stores an image under"""
+    return ('image', os.path.abspath(path), tuple(size) if size else None, alpha)
+
+
+class AssetManager:
+    """Least-recently-used cache of loaded assets, bounded by their pixel bytes"""
+
+    def __init__(self, budget=None):
+        if budget is None:
+            budget = int(float(os.environ.get('SF_ASSET_BUDGET_MB', DEFAULT_BUDGET_MB)) * 1024 * 1024)
+        self.budget = budget
+        self.entries = OrderedDict()  # key: (asset, bytes), least recently used first
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.RLock()  # the prefetch threads load through here too
+
+    def get(self, key, loader, *args):
+        """Cached asset for key, or loader(*args) stored under key"""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+        asset = loader(*args)
+        self.put(key, asset)
+        return asset
+
+    def put(self, key, asset):
+        """Store an asset, then evict old entries until back within budget"""
+        size = asset_bytes(asset)
+        with self.lock:
+            if key in self.entries:
+                self.used -= self.entries.pop(key)[1]
+            self.entries[key] = (asset, size)
+            self.used += size
+            self._evict()
+
+    def grow(self, key, nbytes):
+        """Charge an entry for nbytes of surfaces added to its asset after it was stored"""
+        with self.lock:
+            if key not in self.entries:
+                return  # already evicted, the manager isn't holding it
+            asset, size = self.entries[key]
+            self.entries[key] = (asset, size + nbytes)
+            self.entries.move_to_end(key)
+            self.used += nbytes
+            self._evict()
+
+    def _evict(self):
+        while self.used > self.budget and len(self.entries) > 1:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.used -= evicted_size
+            self.evictions += 1
+
+    def peek(self, key):
+        """Cached asset for key, or None without loading anything
+
+        Keeps the entry recently used but isn't counted as a hit: screens
+        poll this every frame while they wait for an asset.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key][0]
+        return None
+
+    def image(self, path, size=None, alpha=False):
+        """load_image() shared by everything that asks for the same path, size and format"""
+        size = tuple(size) if size else None
+        return self.get(image_key(path, size, alpha), load_image, path, size, alpha)
+
+    def discard(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.used -= self.entries.pop(key)[1]
+
+    def usage(self):
+        """Current cache usage as a dict"""
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.used,
+                'budget': self.budget,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def report(self):
+        usage = self.usage()
+        return (f"Assets: {usage['bytes'] / 1048576:.1f}/{usage['budget'] / 1048576:.0f} MB in "
+                f"{usage['entries']} entries ({usage['hits']} hits, {usage['misses']} misses, "
+                f"{usage['evictions']} evicted)")
+
+
+# Global asset manager instance
+asset_manager = AssetManager()
@@ -0,0 +1,109 @@
+"""
+Background asset loading
+
+Decoding a character's frames and the stage when a fight starts stalls the
+frame loop for a noticeable moment. The prefetcher starts that work on a
+small thread pool as soon as we can guess what will be needed (a portrait
+is hovered, a stage is picked), and the code starting the fight picks up
+the finished result, or waits for the rest of it, or loads it itself if
+nothing was prefetched. Screens that can show a placeholder meanwhile
+(thumbnails) poll ready() instead and never wait.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asset_manager import asset_manager, image_key
+from image_cache import load_image
+from sprite_loader import sprite_loader
+
+PREFETCH_WORKERS = 2
+
+
+class AssetPrefetcher:
+    """Runs asset loaders on worker threads while the results are wanted
+
+    A job is only tracked until it finishes: the loaders go through the asset
+    manager, so a finished result is picked up from there (within its memory
+    budget) and nothing here holds on to prefetches nobody asked for.
+    """
+
+    def __init__(self, workers=PREFETCH_WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asset-prefetch')
+        self.jobs = {}  # key: Future, while it runs
+        self.failed = set()  # keys whose background load raised, not retried by ready()
+        self.lock = threading.Lock()
+
+    def submit(self, key, loader, *args):
+        """Start loader(*args) in the background unless key is already loading"""
+        with self.lock:
+            if key in self.jobs:
+                return
+            job = self.jobs[key] = self.pool.submit(loader, *args)
+        # Outside the lock: a job that is already done runs the callback right here
+        job.add_done_callback(lambda job: self._finished(key, job))
+
+    def _finished(self, key, job):
+        error = None if job.cancelled() else job.exception()
+        with self.lock:
+            if self.jobs.get(key) is job:
+                del self.jobs[key]
+            if error is not None:
+                self.failed.add(key)
+        if error is not None:
+            print(f"Loading {key} failed: {error}")
+
+    def result(self, key, loader, *args):
+        """loader(*args), waiting for a prefetch of key if one is still running
+
+        A finished prefetch left its result with the asset manager, so the
+        loader call is a cache hit then.
+        """
+        with self.lock:
+            job = self.jobs.get(key)
+        if job is not None:
+            try:
+                job.result()
+            except Exception:
+                pass  # reported by _finished(); try again below
+        return loader(*args)
+
+    def ready(self, key, loader, *args):
+        """Asset for key if it is loaded, else None; the first call starts loading it in the background
+        
+        The result is kept by the asset manager under key. A load that fails
+        is reported once and not retried, so callers keep their placeholder.
+        """
+        asset = asset_manager.peek(key)
+        if asset is not None:
+            return asset
+        with self.lock:
+            if key in self.failed:
+                return None
+        self.submit(key, asset_manager.get, key, loader, *args)
+        return None
+    
+    def prefetch_character(self, name):
+        """Decode and scale a character's frames for main.py's fighters"""
+        self.submit(('character', name), sprite_loader.get_character_animations, name)
+
+    def character_animations(self, name):
+        return self.result(('character', name), sprite_loader.get_character_animations, name)
+
+    def prefetch_image(self, path, size=None, alpha=False):
+        """Load an image (e.g. a stage scaled to the screen) through the asset manager"""
+        self.submit(image_key(path, size, alpha), asset_manager.image, path, size, alpha)
+
+    def image(self, path, size=None, alpha=False):
+        return self.result(image_key(path, size, alpha), asset_manager.image, path, size, alpha)
+
+    def ready_image(self, path, size=None, alpha=False):
+        """The image if it is loaded, else None while it loads in the background"""
+        size = tuple(size) if size else None
+        return self.ready(image_key(path, size, alpha), load_image, path, size, alpha)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Global prefetcher instance
+prefetcher = AssetPrefetcher()
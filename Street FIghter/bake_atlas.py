@@ -0,0 +1,117 @@
+"""
+Sprite atlas baker
+
+Packs every frame of a character, cut from its animation strips, scaled and
+trimmed to its opaque pixels exactly as SpriteLoader loads them, into one
+PNG. A JSON manifest next to the PNG lists every frame's
+rectangle in the atlas and its offset inside the full frame.
+
+SpriteLoader uses an atlas when there is an up-to-date one, so loading a
+character is one image decode instead of a directory of strips. Re-run the
+baker after changing the images or a character's config; a stale atlas is
+ignored (and reported) until then.
+
+Usage:
+    python bake_atlas.py [character ...]   - bake the given characters (default: all) into atlas/
+"""
+import json
+import os
+import sys
+import time
+
+import pygame
+
+from sprite_loader import ANIMATION_ORDER, ATLAS_DIR, ATLAS_VERSION, atlas_path, sprite_loader
+
+ATLAS_MAX_WIDTH = 2048
+
+
+def pack(sizes, max_width=ATLAS_MAX_WIDTH):
+    """Shelf-pack (width, height) boxes; returns their positions and the atlas size"""
+    order = sorted(range(len(sizes)), key=lambda i: -sizes[i][1])
+    positions = [None] * len(sizes)
+    x = y = shelf_height = width = 0
+    for i in order:
+        w, h = sizes[i]
+        if x + w > max_width and x > 0:
+            x = 0
+            y += shelf_height
+            shelf_height = 0
+        positions[i] = (x, y)
+        x += w
+        shelf_height = max(shelf_height, h)
+        width = max(width, x)
+    return positions, (max(width, 1), max(y + shelf_height, 1))
+
+
+def bake_character(character_name):
+    """Write atlas/<character>.png and .json; returns the atlas size"""
+    config = sprite_loader.character_configs[character_name]
+    folder = os.path.join("images", config['folder'])
+    sprite_data = sprite_loader._load_sprites_from_folder(folder, config)
+    frame_size = config['size'] * config['scale']
+
+    # Frames come trimmed; animations made from one image repeat the same surface, store it once
+    unique = {}
+    for animation, offsets in zip(sprite_data['animations'], sprite_data['offsets']):
+        for frame, offset in zip(animation, offsets):
+            unique.setdefault(id(frame), (frame, offset))
+    keys = list(unique)
+    positions, atlas_size = pack([unique[key][0].get_size() for key in keys])
+
+    atlas = pygame.Surface(atlas_size, pygame.SRCALPHA)
+    atlas.fill((0, 0, 0, 0))
+    entries = {}
+    for key, position in zip(keys, positions):
+        surface, offset = unique[key]
+        atlas.blit(surface, position)
+        entries[key] = {'rect': [position[0], position[1], surface.get_width(), surface.get_height()],
+                        'offset': list(offset)}
+
+    sources = {}
+    for anim_type in ANIMATION_ORDER:
+        if anim_type in config['animations']:
+            path = os.path.join(folder, config['animations'][anim_type])
+            if os.path.exists(path):
+                sources[path] = os.path.getmtime(path)
+
+    os.makedirs(ATLAS_DIR, exist_ok=True)
+    image_path = atlas_path(character_name, '.png')
+    pygame.image.save(atlas, image_path)
+    manifest = {
+        'version': ATLAS_VERSION,
+        'character': character_name,
+        'image': os.path.basename(image_path),
+        'size': config['size'],
+        'scale': config['scale'],
+        'frame_size': [frame_size, frame_size],
+        'frame_counts': config['frame_counts'],
+        'sources': sources,
+        'animations': [[entries[id(frame)] for frame in animation] for animation in sprite_data['animations']],
+    }
+    with open(atlas_path(character_name, '.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    full_pixels = sum(len(animation) for animation in sprite_data['animations']) * frame_size * frame_size
+    print(f"{character_name}: {len(keys)} frames -> {atlas_size[0]}x{atlas_size[1]} atlas "
+          f"({atlas_size[0] * atlas_size[1] / full_pixels:.0%} of the untrimmed frames)")
+    return atlas_size
+
+
+def main():
+    pygame.init()
+    pygame.display.set_mode((1, 1), pygame.HIDDEN)  # convert_alpha() needs a display
+
+    names = sys.argv[1:] or sprite_loader.get_available_characters()
+    start = time.time()
+    for name in names:
+        if name not in sprite_loader.character_configs:
+            print(f"Unknown character: {name}")
+            continue
+        bake_character(name)
+    print(f"Baked {len(names)} atlases into {os.path.abspath(ATLAS_DIR)} in {time.time() - start:.1f}s")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Headless balance simulation for Street Fighter
+
+Plays a number of matches for every pairing of characters in
+SpriteLoader.character_configs (each character on both sides), using the
+NumPy batch simulator with the pairings split across one worker process per
+CPU core. Writes a report of win rates, average match length and damage per
+special skill.
+
+Usage:
+    python balance_sim.py [matches] [policy] [report]
+        matches - matches per pairing (default 200)
+        policy  - random, scripted, or a replay / input log file to replay (default scripted)
+        report  - output file, .json or .csv (default balance_report.csv)
+
+Replays are recorded matches (see replay.py); an input log is a JSON list of
+[p1_input, p2_input] bitmasks, one pair per frame (see controls.py). Each
+match replays the inputs from a random starting frame.
+"""
+import csv
+import json
+import os
+import sys
+import time
+from itertools import product
+from multiprocessing import Pool
+
+import numpy as np
+
+import controls
+import replay
+import skills
+from batch_simulation import MAX_SKILLS, BatchMatch
+from simulation import FIGHTER_WIDTH, FighterState, MatchState
+
+MAX_FRAMES = 60 * 99  # 99 second round at 60 FPS; still-standing matches count as draws
+ALL_INPUTS = sum(1 << bit for bit in range(10))
+
+# Random policy: chance per frame that a player switches to a new input combination
+RANDOM_CHANGE_CHANCE = 0.1
+# Scripted policy tuning
+SCRIPTED_REACH = 2 * FIGHTER_WIDTH - 40  # close in until the opponent is this near
+SCRIPTED_JUMP_CHANCE = 0.02
+SCRIPTED_IDLE_CHANCE = 0.2  # hesitate now and then so matches play out differently
+
+
+class RandomPolicy:
+    """Mash random inputs, holding each combination for a while"""
+
+    def __init__(self, size, rng):
+        self.rng = rng
+        self.masks = np.zeros((2, size), dtype=np.int32)
+
+    def inputs(self, batch):
+        change = self.rng.random(self.masks.shape) < RANDOM_CHANGE_CHANCE
+        self.masks[change] = self.rng.integers(0, ALL_INPUTS + 1, size=int(change.sum()))
+        return self.masks
+
+
+class ScriptedPolicy:
+    """Walk up to the opponent, then use any ready skill or a basic attack"""
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.skill_bits = np.array(controls.INPUT_SKILLS, dtype=np.int32)
+        self.slots = np.arange(MAX_SKILLS)
+
+    def inputs(self, batch):
+        masks = np.zeros((2, self.size), dtype=np.int32)
+        for player, target in ((0, 1), (1, 0)):
+            distance = batch.x[target] - batch.x[player]
+            near = np.abs(distance) <= SCRIPTED_REACH
+            walk = np.where(distance > 0, controls.INPUT_RIGHT, controls.INPUT_LEFT)
+
+            ready = ((batch.special_cooldowns[player] == 0) &
+                     (self.slots < batch.skill_count[player][:, None]))
+            skill = self.skill_bits[ready.argmax(axis=1)]
+            attack = np.where(self.rng.random(self.size) < 0.5,
+                              controls.INPUT_ATTACK1, controls.INPUT_ATTACK2)
+            strike = np.where(ready.any(axis=1), skill, attack)
+
+            mask = np.where(near, strike, walk)
+            mask |= np.where(self.rng.random(self.size) < SCRIPTED_JUMP_CHANCE, controls.INPUT_JUMP, 0)
+            mask[self.rng.random(self.size) < SCRIPTED_IDLE_CHANCE] = controls.NO_INPUT
+            masks[player] = mask
+        return masks
+
+
+class ReplayPolicy:
+    """Replay a recorded input log, each match from its own starting frame"""
+
+    def __init__(self, size, rng, input_log):
+        self.log = np.array(input_log, dtype=np.int32).T  # (2, frames)
+        self.offsets = rng.integers(0, self.log.shape[1], size=size)
+        self.frame = 0
+
+    def inputs(self, batch):
+        masks = self.log[:, (self.offsets + self.frame) % self.log.shape[1]]
+        self.frame += 1
+        return masks
+
+
+def make_policy(policy, size, rng, input_log=None):
+    if policy == 'random':
+        return RandomPolicy(size, rng)
+    if policy == 'scripted':
+        return ScriptedPolicy(size, rng)
+    return ReplayPolicy(size, rng, input_log)
+
+
+def load_roster():
+    """(name, frame_counts, special_skills) for every configured character"""
+    from sprite_loader import sprite_loader
+    return [(name, config['frame_counts'], config['special_skills'])
+            for name, config in sprite_loader.character_configs.items()]
+
+
+def load_input_log(path):
+    """(p1, p2) input pairs from a replay file or a JSON input log"""
+    with open(path, 'rb') as f:
+        is_replay = f.read(len(replay.MAGIC)) == replay.MAGIC
+    if is_replay:
+        input_log = replay.load_replay(path).inputs
+    else:
+        with open(path) as f:
+            input_log = json.load(f)
+    if not input_log:
+        raise ValueError(f"Input log {path} is empty")
+    return input_log
+
+
+def run_pairings(job):
+    """Play every match of a chunk of pairings as one batch; runs in a worker process"""
+    pairings, matches, policy, input_log, seed = job
+    rng = np.random.default_rng(seed)
+
+    states = [MatchState(FighterState(1, 200, 310, False, fighter1[1], fighter1[2]),
+                         FighterState(2, 700, 310, True, fighter2[1], fighter2[2]))
+              for fighter1, fighter2 in pairings for _ in range(matches)]
+    batch = BatchMatch(states)
+    inputs = make_policy(policy, batch.size, rng, input_log)
+
+    end_frame = np.full(batch.size, MAX_FRAMES, dtype=np.int32)
+    for frame in range(MAX_FRAMES):
+        batch.step(inputs.inputs(batch))
+        finished = (batch.winners() >= 0) & ~batch.round_over
+        end_frame[finished] = frame + 1
+        batch.round_over |= finished  # freezes the match, like round_over in the game
+        if batch.round_over.all():
+            break
+
+    winners = batch.winners()
+    results = []
+    for i, (fighter1, fighter2) in enumerate(pairings):
+        rows = slice(i * matches, (i + 1) * matches)
+        skill_stats = []
+        for player, fighter in enumerate((fighter1, fighter2)):
+            for slot, name in enumerate(fighter[2][:MAX_SKILLS]):
+                skill_stats.append((name, int(batch.skill_uses[player, rows, slot].sum()),
+                                    int(batch.skill_damage[player, rows, slot].sum())))
+        results.append({
+            'p1': fighter1[0],
+            'p2': fighter2[0],
+            'matches': matches,
+            'p1_wins': int((winners[rows] == 1).sum()),
+            'p2_wins': int((winners[rows] == 2).sum()),
+            'draws': int((winners[rows] <= 0).sum()),
+            'timeouts': int((winners[rows] < 0).sum()),
+            'avg_frames': float(end_frame[rows].mean()),
+            'skills': skill_stats,
+        })
+    return results
+
+
+def run_balance(matches=200, policy='scripted', input_log=None, processes=None, seed=0):
+    """Simulate every pairing across a process pool and return the per-pairing results"""
+    roster = load_roster()
+    pairings = list(product(roster, repeat=2))
+    processes = processes or os.cpu_count() or 1
+    # One chunk of pairings per worker; a bigger batch spreads NumPy's per-call overhead
+    chunks = [pairings[i::processes] for i in range(processes) if pairings[i::processes]]
+    jobs = [(chunk, matches, policy, input_log, seed + i) for i, chunk in enumerate(chunks)]
+    print(f"Simulating {len(pairings)} pairings x {matches} matches ({policy} inputs) "
+          f"on {len(jobs)} processes...")
+    with Pool(len(jobs)) as pool:
+        return [result for chunk in pool.imap_unordered(run_pairings, jobs) for result in chunk]
+
+
+def summarize(results):
+    """Fold pairing results into per-character and per-skill tables"""
+    characters = {}
+    skill_totals = {}
+    for result in results:
+        for side, wins, loses in (('p1', 'p1_wins', 'p2_wins'), ('p2', 'p2_wins', 'p1_wins')):
+            stats = characters.setdefault(result[side], {'matches': 0, 'wins': 0, 'losses': 0})
+            stats['matches'] += result['matches']
+            stats['wins'] += result[wins]
+            stats['losses'] += result[loses]
+        for name, uses, damage in result['skills']:
+            stats = skill_totals.setdefault(name, {'matches': 0, 'uses': 0, 'damage': 0})
+            stats['matches'] += result['matches']
+            stats['uses'] += uses
+            stats['damage'] += damage
+
+    for stats in characters.values():
+        stats['win_rate'] = stats['wins'] / stats['matches']
+    for name, stats in skill_totals.items():
+        stats['base_damage'], stats['range'] = skills.SKILL_TABLE.get(name, skills.DEFAULT_EFFECT)
+        stats['damage_per_use'] = stats['damage'] / stats['uses'] if stats['uses'] else 0.0
+        stats['damage_per_match'] = stats['damage'] / stats['matches']
+    return characters, skill_totals
+
+
+def write_report(path, results, characters, skill_totals):
+    """JSON report in one file, or CSV as <report>, <report>_characters and <report>_skills"""
+    pairings = [{key: value for key, value in result.items() if key != 'skills'}
+                for result in sorted(results, key=lambda r: (r['p1'], r['p2']))]
+    if path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump({'pairings': pairings, 'characters': characters, 'skills': skill_totals}, f, indent=2)
+        return [path]
+
+    stem = os.path.splitext(path)[0]
+    tables = [
+        (path, pairings),
+        (stem + '_characters.csv', [dict(character=name, **stats) for name, stats in sorted(characters.items())]),
+        (stem + '_skills.csv', [dict(skill=name, **stats) for name, stats in sorted(skill_totals.items())]),
+    ]
+    for table_path, rows in tables:
+        with open(table_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+    return [table_path for table_path, _ in tables]
+
+
+def print_summary(characters, skill_totals):
+    print("\nWin rates:")
+    for name, stats in sorted(characters.items(), key=lambda item: -item[1]['win_rate']):
+        print(f"  {name:20} {stats['win_rate']:6.1%}  ({stats['wins']}/{stats['matches']})")
+    print("\nSkill damage per match:")
+    for name, stats in sorted(skill_totals.items(), key=lambda item: -item[1]['damage_per_match']):
+        print(f"  {name:20} {stats['damage_per_match']:6.1f}  "
+              f"({stats['uses']} uses, {stats['damage_per_use']:.1f} per use, base {stats['base_damage']})")
+
+
+def main():
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    policy = sys.argv[2] if len(sys.argv) > 2 else 'scripted'
+    report = sys.argv[3] if len(sys.argv) > 3 else 'balance_report.csv'
+
+    input_log = None
+    if policy not in ('random', 'scripted'):
+        try:
+            input_log = load_input_log(policy)
+        except (OSError, ValueError) as e:
+            print(f"Could not load input log: {e}")
+            sys.exit(1)
+
+    start = time.time()
+    results = run_balance(matches, policy, input_log)
+    characters, skill_totals = summarize(results)
+    print_summary(characters, skill_totals)
+    for path in write_report(report, results, characters, skill_totals):
+        print(f"Wrote {path}")
+    print(f"Done in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Batch fight simulator for balance tuning
+
+Runs many matches at once with NumPy (pip install numpy). Every per-fighter
+field of simulation.FighterState is an array of shape (2, N) - player,
+match - and each phase of simulation.step() is applied to all N matches
+with a handful of array operations. The phases run in the same order as the
+scalar core (player 1 moves, player 2 moves, then both animations update),
+so the results are identical to stepping the MatchStates one at a time.
+
+Usage:
+    python batch_simulation.py [matches] [frames]   - check against simulation.py and time it
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+import controls
+import simulation
+import skills
+from simulation import (ANIMATION_TICKS, ATTACK_COOLDOWN, ATTACK_DAMAGE, FLOOR_MARGIN, GRAVITY,
+                        JUMP_VELOCITY, SPEED)
+
+# FighterState fields stepped every frame
+INT_FIELDS = ('x', 'y', 'vel_y', 'health', 'action', 'frame_index', 'frame_timer',
+              'attack_type', 'attack_cooldown', 'special_type')
+BOOL_FIELDS = ('flip', 'running', 'jump', 'attacking', 'attack_started', 'hit', 'alive',
+               'using_special')
+
+ACTION_COUNT = simulation.SPECIAL2 + 1
+MAX_SKILLS = len(controls.INPUT_SKILLS)
+
+# Skill registry as arrays indexed by skill id
+SKILL_DAMAGE = np.array(skills.SKILL_DAMAGE, dtype=np.int32)
+SKILL_RANGE = np.array(skills.SKILL_RANGE, dtype=np.int32)
+SKILL_COOLDOWN = np.array(skills.SKILL_COOLDOWN, dtype=np.int32)
+SKILL_HIT_OFFSET = np.array(skills.SKILL_HIT_OFFSET, dtype=np.int32)
+
+
+class BatchMatch:
+    """N matches stepped together, loaded from simulation.MatchState objects"""
+
+    def __init__(self, matches):
+        self.size = len(matches)
+        self.rows = np.arange(self.size)
+        self.screen_width = np.array([m.screen_width for m in matches], dtype=np.int32)
+        self.screen_height = np.array([m.screen_height for m in matches], dtype=np.int32)
+        self.round_over = np.array([m.round_over for m in matches], dtype=bool)
+        self.frame = np.array([m.frame for m in matches], dtype=np.int32)
+
+        fighters = [[m.fighters[player] for m in matches] for player in range(2)]
+        for name in INT_FIELDS + ('width', 'height'):
+            setattr(self, name, np.array([[getattr(f, name) for f in row] for row in fighters], dtype=np.int32))
+        for name in BOOL_FIELDS:
+            setattr(self, name, np.array([[getattr(f, name) for f in row] for row in fighters], dtype=bool))
+        self.special_cooldowns = np.array([[f.special_cooldowns for f in row] for row in fighters], dtype=np.int32)
+
+        # Static per-fighter tables: skill ids per slot and frames per action
+        # (missing actions fall back to idle, as in FighterState.frame_count)
+        self.skill_count = np.array([[min(len(f.skill_ids), MAX_SKILLS) for f in row] for row in fighters], dtype=np.int32)
+        self.skill_ids = np.zeros((2, self.size, MAX_SKILLS), dtype=np.int32)
+        self.frame_counts = np.zeros((2, self.size, ACTION_COUNT), dtype=np.int32)
+        for player, row in enumerate(fighters):
+            for match, fighter in enumerate(row):
+                ids = fighter.skill_ids[:MAX_SKILLS]
+                self.skill_ids[player, match, :len(ids)] = ids
+                self.frame_counts[player, match] = [fighter.frame_count(action) for action in range(ACTION_COUNT)]
+
+        # Damage dealt, for balance reports: basic attacks and each skill slot
+        self.attack_damage = np.zeros((2, self.size), dtype=np.int32)
+        self.skill_damage = np.zeros((2, self.size, MAX_SKILLS), dtype=np.int32)
+        self.skill_uses = np.zeros((2, self.size, MAX_SKILLS), dtype=np.int32)
+
+    def store(self, matches):
+        """Write the current state back into the MatchStates (same order as loaded)"""
+        for i, match in enumerate(matches):
+            match.frame = int(self.frame[i])
+            match.round_over = bool(self.round_over[i])
+        for player in range(2):
+            fighters = [m.fighters[player] for m in matches]
+            for name in INT_FIELDS + BOOL_FIELDS:
+                for fighter, value in zip(fighters, getattr(self, name)[player].tolist()):
+                    setattr(fighter, name, value)
+            for fighter, cooldowns in zip(fighters, self.special_cooldowns[player].tolist()):
+                fighter.special_cooldowns[:] = cooldowns
+
+    def winners(self):
+        """Per match: 1 or 2 for the survivor, 0 for a draw, -1 while both are alive"""
+        alive1, alive2 = self.alive
+        return np.select([alive1 & alive2, alive1, alive2], [-1, 1, 2], 0)
+
+    def step(self, inputs):
+        """Advance every match by one tick; inputs is a (2, N) array of input bitmasks"""
+        inputs = np.asarray(inputs)
+        self.move(0, 1, inputs[0])
+        self.move(1, 0, inputs[1])
+        self.update(0)
+        self.update(1)
+        self.frame += 1
+
+    def collide(self, ax, ay, aw, ah, target):
+        """rects_collide() of a box per match against the target fighters"""
+        bx, by = self.x[target], self.y[target]
+        bw, bh = self.width[target], self.height[target]
+        return ((aw > 0) & (ah > 0) & (bw > 0) & (bh > 0) &
+                (ax < bx + bw) & (bx < ax + aw) & (ay < by + bh) & (by < ay + ah))
+
+    def move(self, player, target, input_mask):
+        """simulation.move() for one player against the other in every match"""
+        x, y, vel_y = self.x[player], self.y[player], self.vel_y[player]
+        self.running[player] = False
+        self.attack_type[player] = 0
+        self.attack_started[player] = False
+
+        #can only perform other actions if not currently attacking
+        can_act = (~self.attacking[player] & self.alive[player] & ~self.round_over &
+                   ~self.using_special[player])
+
+        def pressed(bits):
+            return can_act & ((input_mask & bits) != 0)
+
+        #movement
+        left = pressed(controls.INPUT_LEFT)
+        right = pressed(controls.INPUT_RIGHT)
+        dx = np.where(right, SPEED, np.where(left, -SPEED, 0))
+        self.running[player] |= left | right
+        #jump
+        jump = pressed(controls.INPUT_JUMP) & ~self.jump[player]
+        vel_y[jump] = JUMP_VELOCITY
+        self.jump[player] |= jump
+        #basic attacks
+        self.attack(player, target, pressed(controls.INPUT_ATTACK1 | controls.INPUT_ATTACK2))
+        self.attack_type[player][pressed(controls.INPUT_ATTACK1)] = 1
+        self.attack_type[player][pressed(controls.INPUT_ATTACK2)] = 2
+        #special skills, one slot at a time as in the scalar loop
+        for slot, bit in enumerate(controls.INPUT_SKILLS):
+            self.use_special_skill(player, target, slot, pressed(bit) & (self.skill_count[player] > slot))
+
+        #apply gravity
+        vel_y += GRAVITY
+        dy = vel_y.copy()
+
+        #ensure player stays on screen
+        dx = np.where(x + dx < 0, -x, dx)
+        right_edge = x + self.width[player]
+        dx = np.where(right_edge + dx > self.screen_width, self.screen_width - right_edge, dx)
+        bottom = y + self.height[player]
+        floor = self.screen_height - FLOOR_MARGIN
+        landed = bottom + dy > floor
+        vel_y[landed] = 0
+        self.jump[player][landed] = False
+        dy = np.where(landed, floor - bottom, dy)
+
+        #ensure players face each other
+        self.flip[player] = ~(self.x[target] + self.width[target] // 2 > x + self.width[player] // 2)
+
+        #apply attack and special skill cooldowns
+        attack_cooldown = self.attack_cooldown[player]
+        attack_cooldown[attack_cooldown > 0] -= 1
+        special_cooldowns = self.special_cooldowns[player]
+        special_cooldowns[special_cooldowns > 0] -= 1
+
+        #update player position
+        x += dx
+        y += dy
+
+    def attack(self, player, target, active):
+        ready = active & (self.attack_cooldown[player] == 0)
+        self.attacking[player] |= ready
+        self.attack_started[player] |= ready
+        width = 2 * self.width[player]
+        centerx = self.x[player] + self.width[player] // 2
+        hit = ready & self.collide(centerx - width * self.flip[player], self.y[player],
+                                   width, self.height[player], target)
+        self.health[target][hit] -= ATTACK_DAMAGE
+        self.hit[target] |= hit
+        self.attack_damage[player][hit] += ATTACK_DAMAGE
+
+    def use_special_skill(self, player, target, slot, active):
+        cooldowns = self.special_cooldowns[player, :, slot]
+        fire = active & (cooldowns == 0) & ~self.using_special[player]
+        self.using_special[player] |= fire
+        self.special_type[player][fire] = slot + 1
+        self.attack_started[player] |= fire
+        self.skill_uses[player, :, slot] += fire
+
+        skill = self.skill_ids[player, :, slot]
+        centerx = self.x[player] + self.width[player] // 2
+        hit = fire & self.collide(centerx + SKILL_HIT_OFFSET[skill, self.flip[player].astype(np.intp)],
+                                  self.y[player], SKILL_RANGE[skill], self.height[player], target)
+        damage = np.where(hit, SKILL_DAMAGE[skill], 0)
+        self.health[target] -= damage
+        self.hit[target] |= hit
+        self.skill_damage[player, :, slot] += damage
+        cooldowns[fire] = SKILL_COOLDOWN[skill][fire]
+
+    def update(self, player):
+        """simulation.update() for one player in every match"""
+        health = self.health[player]
+        alive = self.alive[player]
+        action = self.action[player]
+        frame_index = self.frame_index[player]
+        frame_timer = self.frame_timer[player]
+
+        #check what action the player is performing
+        dead = health <= 0
+        health[dead] = 0
+        alive[dead] = False
+        using_special = self.using_special[player]
+        special_type = self.special_type[player]
+        attacking = self.attacking[player]
+        attack_type = self.attack_type[player]
+        new_action = np.select(
+            [dead, self.hit[player],
+             using_special & (special_type == 1), using_special & (special_type == 2), using_special,
+             attacking & (attack_type == 1), attacking & (attack_type == 2), attacking,
+             self.jump[player], self.running[player]],
+            [simulation.DEATH, simulation.HIT,
+             simulation.SPECIAL1, simulation.SPECIAL2, action,
+             simulation.ATTACK1, simulation.ATTACK2, action,
+             simulation.JUMP, simulation.RUN],
+            simulation.IDLE)
+        changed = new_action != action
+        action[:] = new_action
+        frame_index[changed] = 0
+        frame_timer[changed] = 0
+
+        #advance the frame once it has been shown for ANIMATION_TICKS ticks
+        advance = frame_timer >= ANIMATION_TICKS
+        frame_index[advance] += 1
+        frame_timer[advance] = 0
+        frame_timer += 1
+
+        #check if the animation has finished
+        frame_count = self.frame_counts[player][self.rows, action]
+        finished = frame_index >= frame_count
+        dying = finished & ~alive
+        frame_index[dying] = frame_count[dying] - 1
+        done = finished & alive
+        frame_index[done] = 0
+        attack_done = done & ((action == simulation.ATTACK1) | (action == simulation.ATTACK2))
+        attacking[attack_done] = False
+        self.attack_cooldown[player][attack_done] = ATTACK_COOLDOWN
+        special_done = done & ((action == simulation.SPECIAL1) | (action == simulation.SPECIAL2))
+        using_special[special_done] = False
+        hit_done = done & (action == simulation.HIT)
+        self.hit[player][hit_done] = False
+        attacking[hit_done] = False
+        using_special[hit_done] = False
+        self.attack_cooldown[player][hit_done] = ATTACK_COOLDOWN
+
+
+def random_matches(count, seed=0):
+    """Scalar matches between random skill sets and animation lengths"""
+    rng = random.Random(seed)
+    rosters = list(skills.CHARACTER_SKILLS.values()) + [skills.DEFAULT_CHARACTER_SKILLS]
+    matches = []
+    for _ in range(count):
+        fighters = []
+        for player, x, flip in ((1, 200, False), (2, 700, True)):
+            frame_counts = [rng.randint(1, 12) for _ in range(rng.randint(7, ACTION_COUNT))]
+            fighters.append(simulation.FighterState(player, x, 310, flip, frame_counts,
+                                                    list(rng.choice(rosters))))
+        matches.append(simulation.MatchState(*fighters))
+    return matches
+
+
+def random_inputs(count, frames, seed=0, change_chance=0.1):
+    """(frames, 2, count) input masks; each player holds a random input for a while"""
+    rng = np.random.default_rng(seed)
+    all_bits = sum(1 << bit for bit in range(10))
+    masks = rng.integers(0, all_bits + 1, size=(frames, 2, count), dtype=np.int32)
+    # Mostly keep the previous frame's input so moves get to play out
+    hold = rng.random((frames, 2, count)) >= change_chance
+    hold[0] = False
+    for frame in range(1, frames):
+        masks[frame][hold[frame]] = masks[frame - 1][hold[frame]]
+    return masks
+
+
+def verify(count=64, frames=1200, seed=0):
+    """Step random matches with both engines and compare them every frame"""
+    reference = random_matches(count, seed)
+    mirror = random_matches(count, seed)
+    batch = BatchMatch(mirror)
+    inputs = random_inputs(count, frames, seed)
+    for frame in range(frames):
+        for i, match in enumerate(reference):
+            simulation.step(match, int(inputs[frame, 0, i]), int(inputs[frame, 1, i]))
+        batch.step(inputs[frame])
+        batch.store(mirror)
+        for i in range(count):
+            if reference[i].snapshot() != mirror[i].snapshot():
+                print(f"Mismatch in match {i} at frame {frame}")
+                return False
+    print(f"Batch and scalar engines agree on {count} matches x {frames} frames")
+    return True
+
+
+def benchmark(count=4096, frames=600):
+    """Time the batch engine against the scalar one"""
+    inputs = random_inputs(count, frames)
+    batch = BatchMatch(random_matches(count))
+    start = time.perf_counter()
+    for frame in range(frames):
+        batch.step(inputs[frame])
+    batch_time = time.perf_counter() - start
+
+    scalar_count = min(count, 256)
+    matches = random_matches(scalar_count)
+    scalar_inputs = inputs[:, :, :scalar_count].tolist()
+    start = time.perf_counter()
+    for frame in range(frames):
+        p1_inputs, p2_inputs = scalar_inputs[frame]
+        for i, match in enumerate(matches):
+            simulation.step(match, p1_inputs[i], p2_inputs[i])
+    scalar_time = time.perf_counter() - start
+
+    print(f"Batch:  {count * frames / batch_time:,.0f} match-ticks/s ({count} matches)")
+    print(f"Scalar: {scalar_count * frames / scalar_time:,.0f} match-ticks/s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 1200
+    if verify(count, frames):
+        benchmark()
+    else:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
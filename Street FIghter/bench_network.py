@@ -0,0 +1,150 @@
+"""
+Message throughput benchmark
+
+Opens local TCP connections and pushes in-game messages through them as
+fast as possible, the way the room server relays inputs between players.
+Reports messages per second for each connection:
+
+    framed     send_message() per message, MessageReader on the other end
+    receive    frames encoded up front and sent in bursts, so only the
+               receiving side is measured
+    unframed   the old receive loop (recv(4096) + pickle.loads), which loses
+               every message that arrives split or stuck to another one
+
+Usage:
+    python bench_network.py [messages] [connections] [padding]
+        defaults: 100000 messages, 1 connection, no padding; with padding
+        every message is a chat line that many characters long, to test
+        large frames
+"""
+import pickle
+import socket
+import sys
+import threading
+import time
+
+import controls
+from framing import MessageReader, encode, send_message
+
+
+PADDING = 0  # chat line length for large-frame runs, set from the command line
+
+
+def input_message(frame):
+    """The message a client gets every frame of a fight"""
+    if PADDING:
+        return {'type': 'room_chat', 'sender': 'Player_1', 'message': 'x' * PADDING, 'timestamp': frame}
+    return {
+        'type': 'opponent_input',
+        'role': 'host',
+        'input': controls.pack(controls.INPUT_RIGHT if frame % 2 else controls.NO_INPUT),
+        'game_state': {'rect': [200 + frame % 600, 310], 'health': 100, 'action': 1,
+                       'frame_index': frame % 8, 'flip': False},
+    }
+
+
+def connection_pair():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    sender = socket.create_connection(listener.getsockname())
+    receiver, _ = listener.accept()
+    listener.close()
+    for sock in (sender, receiver):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sender, receiver
+
+
+def send_framed(sock, count):
+    for frame in range(count):
+        send_message(sock, input_message(frame))
+    sock.shutdown(socket.SHUT_WR)
+
+
+def send_bursts(sock, count):
+    frames = b''.join(encode(input_message(frame)) for frame in range(count))
+    with memoryview(frames) as view:
+        for offset in range(0, len(frames), 65536):
+            sock.sendall(view[offset:offset + 65536])
+    sock.shutdown(socket.SHUT_WR)
+
+
+def receive_framed(sock, count):
+    reader = MessageReader()
+    received = 0
+    while True:
+        messages = reader.receive(sock)
+        if messages is None:
+            return received
+        received += len(messages)
+
+
+def send_unframed(sock, count):
+    for frame in range(count):
+        sock.sendall(pickle.dumps(input_message(frame)))
+    sock.shutdown(socket.SHUT_WR)
+
+
+def receive_unframed(sock, count):
+    """The receive loop the servers and clients used before framing.py
+
+    Unpickling chunks that start mid-message runs arbitrary opcodes; now and
+    then CPython prints a SystemError about bytearray buffers from it.
+    """
+    received = 0
+    while True:
+        data = sock.recv(4096)
+        if not data:
+            return received
+        try:
+            pickle.loads(data)
+            received += 1
+        except Exception:
+            pass  # "Error processing message"
+
+
+def run(sender_loop, receiver_loop, messages, connections):
+    """Per-connection results as (messages received, seconds)"""
+    results = [None] * connections
+
+    def connection(index):
+        sender, receiver = connection_pair()
+        send_thread = threading.Thread(target=sender_loop, args=(sender, messages))
+        send_thread.start()
+        receiver.recv(1, socket.MSG_PEEK)  # time from the first byte, not from encoding
+        start = time.perf_counter()
+        received = receiver_loop(receiver, messages)
+        results[index] = (received, time.perf_counter() - start)
+        send_thread.join()
+        sender.close()
+        receiver.close()
+
+    threads = [threading.Thread(target=connection, args=(i,)) for i in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def report(name, results, messages):
+    rates = [received / seconds for received, seconds in results]
+    lost = sum(messages - received for received, _ in results)
+    print(f"{name:10} {sum(rates) / len(rates):>10,.0f} msg/s per connection, "
+          f"{sum(rates):>10,.0f} msg/s total, {lost} of {messages * len(results)} lost")
+
+
+def main():
+    global PADDING
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    connections = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    PADDING = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    print(f"{messages} messages of {len(encode(input_message(0)))} bytes over {connections} connection(s)")
+    report('framed', run(send_framed, receive_framed, messages, connections), messages)
+    report('receive', run(send_bursts, receive_framed, messages, connections), messages)
+    if not PADDING:  # large messages are always split, nothing would get through
+        report('unframed', run(send_unframed, receive_unframed, messages, connections), messages)
+
+
+if __name__ == "__main__":
+    main()
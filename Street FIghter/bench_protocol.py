@@ -0,0 +1,68 @@
+"""
+Wire format benchmark
+
+Encodes and decodes a sample of every kind of message the game sends, with
+protocol.py and with pickle (what the game sent before), and reports the
+payload size and the time per message for each.
+
+Usage:
+    python bench_protocol.py [iterations]
+        default: 100000 iterations per message
+"""
+import pickle
+import sys
+import time
+
+import controls
+from protocol import decode_message, encode_message
+
+
+def sample_messages():
+    """(label, message) pairs, hot per-frame messages first"""
+    state = {'rect': [412, 310], 'health': 85, 'action': 3, 'frame_index': 5, 'flip': True}
+    rooms = [{
+        'room_id': f'room_{n}', 'room_name': f"Player_{4821 + n}'s Room", 'room_code': f'K7Q2X{n}',
+        'host_nickname': f'Player_{4821 + n}', 'player_count': 1, 'max_players': 2,
+        'is_full': False, 'is_private': False, 'phase': 'waiting',
+    } for n in range(8)]
+    character = {'name': 'Samurai', 'special_skills': ['Fireball', 'Dash Strike']}
+    return [
+        ('input', {'type': 'input', 'frame': 1834, 'input': controls.pack(controls.INPUT_RIGHT)}),
+        ('game_input', {'type': 'game_input', 'input': controls.pack(controls.INPUT_ATTACK1),
+                        'game_state': state}),
+        ('opponent_input', {'type': 'opponent_input', 'role': 'guest',
+                            'input': controls.pack(controls.INPUT_ATTACK1), 'game_state': state}),
+        ('sync_state', {'type': 'sync_state', 'player_id': 2, 'state': state}),
+        ('room_chat', {'type': 'room_chat', 'sender': 'Player_4821', 'message': 'gg, rematch?',
+                       'timestamp': 1760700000.25}),
+        ('character_select', {'type': 'character_select', 'character': character}),
+        ('room_list (8)', {'type': 'room_list', 'rooms': rooms}),
+        ('match_found', {'type': 'match_found', 'session_id': 'session_3', 'player_number': 1}),
+    ]
+
+
+def per_message(function, argument, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(argument)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{'message':18} {'bytes':>13} {'encode us':>15} {'decode us':>15}")
+    print(f"{'':18} {'pickle  wire':>13} {'pickle   wire':>15} {'pickle   wire':>15}")
+    for label, message in sample_messages():
+        pickled = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+        payload = encode_message(message)
+        assert decode_message(payload) == message, label
+        encode_pickle = per_message(lambda m: pickle.dumps(m, pickle.HIGHEST_PROTOCOL), message, iterations)
+        encode_wire = per_message(encode_message, message, iterations)
+        decode_pickle = per_message(pickle.loads, pickled, iterations)
+        decode_wire = per_message(decode_message, payload, iterations)
+        print(f"{label:18} {len(pickled):>6} {len(payload):>6} "
+              f"{encode_pickle:>7.2f} {encode_wire:>7.2f} {decode_pickle:>7.2f} {decode_wire:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
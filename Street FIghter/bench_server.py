@@ -0,0 +1,116 @@
+"""
+Matchmaking server load test
+
+Starts server.py in its own process, connects two players per session and
+keeps every session busy: each player sends an input as soon as the
+opponent's last one reaches them, so two inputs per session are always in
+flight. For each session count it reports how many inputs the server
+relayed per second and, where /proc is available, how much CPU the server
+process used for them.
+
+Usage:
+    python bench_server.py [seconds] [sessions ...]
+        defaults: 5 seconds each for 1, 10, 100, 1000 sessions
+"""
+import os
+import selectors
+import socket
+import subprocess
+import sys
+import time
+
+import controls
+from framing import MessageReader, encode
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_cpu_seconds(pid):
+    """User + system CPU time of a process, or None without /proc"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def connect(port, timeout=10):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return socket.create_connection(('127.0.0.1', port))
+        except ConnectionRefusedError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def run(sessions, seconds):
+    """(inputs relayed per second, server CPU seconds or None) for a number of sessions"""
+    port = free_port()
+    server = subprocess.Popen([sys.executable, SERVER, '127.0.0.1', str(port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    selector = selectors.DefaultSelector()
+    try:
+        readers = {}
+        for _ in range(2 * sessions):
+            sock = connect(port)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            readers[sock] = MessageReader(4096)
+
+        # Wait for every match before timing anything
+        for sock, reader in readers.items():
+            matched = False
+            while not matched:
+                messages = reader.receive(sock)
+                if messages is None:
+                    raise ConnectionError("Server closed a connection before matching it")
+                matched = any(message['type'] == 'match_found' for message in messages)
+            sock.setblocking(False)
+            selector.register(sock, selectors.EVENT_READ, reader)
+
+        frame = encode({'type': 'input', 'input': controls.pack(controls.INPUT_RIGHT)})
+        for sock in readers:
+            sock.send(frame)
+        relayed = 0
+        cpu_before = server_cpu_seconds(server.pid)
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            for key, _ in selector.select(1.0):
+                for message in key.data.receive(key.fileobj) or ():
+                    if message['type'] == 'player_input':
+                        relayed += 1
+                        key.fileobj.send(frame)
+        elapsed = time.perf_counter() - start
+        cpu_after = server_cpu_seconds(server.pid)
+        cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+        return relayed / elapsed, cpu
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+        server.kill()
+        server.wait()
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    counts = [int(arg) for arg in sys.argv[2:]] or [1, 10, 100, 1000]
+    print(f"{'sessions':>8} {'inputs/s':>10} {'server CPU':>11} {'inputs per CPU s':>17}")
+    for sessions in counts:
+        rate, cpu = run(sessions, seconds)
+        if cpu:
+            print(f"{sessions:>8} {rate:>10,.0f} {cpu / seconds:>10.0%} {rate * seconds / cpu:>17,.0f}")
+        else:
+            print(f"{sessions:>8} {rate:>10,.0f} {'-':>11} {'-':>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 import pygame
 import os
 from sprite_loader import sprite_loader
+from asset_manager import asset_manager
+from asset_prefetch import prefetcher
+from image_cache import load_image
+from image_info import folder_index
+from skills import character_skills
 
 class CharacterSelect:
     def __init__(self, screen_width, screen_height):
@@ -22,14 +27,21 @@ class CharacterSelect:
         self.background_image = None
         self.background_loaded = False
         
+        # Start loading a fighter's sprites as soon as the portrait is hovered
+        # or picked; the room client swaps in its own sprite sheet loader
+        self.prefetch_character = prefetcher.prefetch_character
+        self.hovered_character = None
+        self.next_background = None  # random stage for local play, picked early so it can preload
+        
         # Background caching
         self.background_image = None
         self.background_loaded = False
         
     def load_character_portraits(self):
+        """Character entries with placeholder portraits; the real ones are made on first draw"""
         portraits = []
         portrait_path = "images/"
-        loaded_names = []
+        missing = []
         
         # Your exact 12 character folder names
         character_folders = [
@@ -38,72 +50,56 @@ class CharacterSelect:
             'Shinobi', 'Wanderer_Magican', 'warrior', 'wizard'
         ]
         
-        # Load portraits from your character folders
-        if os.path.exists(portrait_path):
-            for folder_name in character_folders:
-                folder_path = os.path.join(portrait_path, folder_name)
-                if os.path.exists(folder_path) and os.path.isdir(folder_path):
-                    # Look for any image file that could be a portrait
-                    portrait_found = False
-                    for file in os.listdir(folder_path):
-                        if file.endswith(('.png', '.jpg', '.jpeg')):
-                            # Try files that might be portraits first
-                            if any(word in file.lower() for word in ['portrait', 'face', 'head', 'icon']):
-                                try:
-                                    img = pygame.image.load(os.path.join(folder_path, file))
-                                    img = pygame.transform.scale(img, (100, 100))
-                                    
-                                    portraits.append({
-                                        'image': img,
-                                        'name': folder_name,
-                                        'special_skills': self.get_character_skills(folder_name)
-                                    })
-                                    loaded_names.append(folder_name)
-                                    portrait_found = True
-                                    print(f"Loaded portrait for {folder_name}: {file}")
-                                    break
-                                except Exception as e:
-                                    print(f"Error loading {file}: {e}")
-                                    continue
-                    
-                    # If no portrait found, try the first image in the folder
-                    if not portrait_found:
-                        for file in os.listdir(folder_path):
-                            if file.endswith(('.png', '.jpg', '.jpeg')):
-                                try:
-                                    img = pygame.image.load(os.path.join(folder_path, file))
-                                    # Extract a portion of the sprite sheet as portrait if it's large
-                                    if img.get_width() > 200 or img.get_height() > 200:
-                                        # Assume it's a sprite sheet, extract top-left portion
-                                        portrait_rect = pygame.Rect(0, 0, min(162, img.get_width()), min(162, img.get_height()))
-                                        img = img.subsurface(portrait_rect)
-                                    
-                                    img = pygame.transform.scale(img, (100, 100))
-                                    
-                                    portraits.append({
-                                        'image': img,
-                                        'name': folder_name,
-                                        'special_skills': self.get_character_skills(folder_name)
-                                    })
-                                    loaded_names.append(folder_name)
-                                    print(f"Loaded sprite as portrait for {folder_name}: {file}")
-                                    break
-                                except Exception as e:
-                                    print(f"Error loading {file}: {e}")
-                                    continue
-        
-        # Create placeholders for any missing characters
+        # Only folders with images get a portrait (the header index lists them without decoding)
         for folder_name in character_folders:
-            if folder_name not in loaded_names and len(portraits) < 12:
-                placeholder_img = self.create_placeholder_portrait(folder_name)
+            if not folder_index(os.path.join(portrait_path, folder_name)):
+                missing.append(folder_name)
+                continue
+            portraits.append({
+                'image': self.create_placeholder_portrait(folder_name),  # until portrait_image() has the real one
+                'name': folder_name,
+                'special_skills': self.get_character_skills(folder_name)
+            })
+        
+        # Placeholders for any missing characters go last
+        for folder_name in missing:
+            if len(portraits) < 12:
                 portraits.append({
-                    'image': placeholder_img,
+                    'image': self.create_placeholder_portrait(folder_name),
                     'name': folder_name,
                     'special_skills': self.get_character_skills(folder_name)
                 })
                 print(f"Created placeholder for {folder_name}")
         
         return portraits[:12]
+    
+    def portrait_image(self, char):
+        """A character's portrait, or its placeholder while the portrait is made in the background"""
+        return prefetcher.ready(('portrait', char['name']), self.load_portrait, char) or char['image']
+    
+    def load_portrait(self, char):
+        """Make a 100x100 portrait from a character folder (runs on a prefetch thread)"""
+        folder_path = os.path.join("images", char['name'])
+        files = list(folder_index(folder_path))
+        
+        # Try files that might be portraits first
+        for file in files:
+            if any(word in file.lower() for word in ['portrait', 'face', 'head', 'icon']):
+                print(f"Loaded portrait for {char['name']}: {file}")
+                return load_image(os.path.join(folder_path, file), (100, 100), alpha=True)
+        
+        # Otherwise use the first image in the folder
+        for file in files:
+            img = load_image(os.path.join(folder_path, file), alpha=True)
+            # Extract a portion of the sprite sheet as portrait if it's large
+            if img.get_width() > 200 or img.get_height() > 200:
+                # Assume it's a sprite sheet, extract top-left portion
+                portrait_rect = pygame.Rect(0, 0, min(162, img.get_width()), min(162, img.get_height()))
+                img = img.subsurface(portrait_rect)
+            print(f"Loaded sprite as portrait for {char['name']}: {file}")
+            return pygame.transform.scale(img, (100, 100))
+        
+        return char['image']  # no images, keep the placeholder
 
     def create_placeholder_portrait(self, name):
         # Create a colored placeholder portrait
@@ -143,48 +139,22 @@ class CharacterSelect:
         return img
     
     def get_character_skills(self, char_name):
-        # Updated to match your exact character names
-        special_chars = {
-            'kunoichi': ['shadow_strike', 'invisibility'],
-            'lightning_mage': ['lightning_bolt', 'chain_lightning'],
-            'ninja_monk': ['meditation', 'spirit_punch'],
-            'ninja_peasant': ['farm_tools', 'humble_strike'],
-            'samurai': ['katana_slash', 'honor_guard'],
-            'samurai_archer': ['arrow_rain', 'precision_shot'],
-            'samurai_commander': ['battle_cry', 'tactical_strike'],
-            'samurai_warrior': ['blade_fury', 'warrior_spirit'],
-            'shinobi': ['smoke_bomb', 'shadow_clone'],
-            'wanderer_magican': ['magic_missile', 'teleport'],
-            'warrior': ['sword_slash', 'shield_bash'],
-            'wizard': ['fireball', 'ice_shard']
-        }
-        return special_chars.get(char_name.lower(), ['basic_attack', 'power_strike'])
+        return character_skills(char_name)
     
     def load_backgrounds(self):
+        """Stage entries with placeholder previews; the real ones are made on first draw"""
         backgrounds = []
         bg_path = "images/background/"
-        loaded_backgrounds = []
-        
-        if os.path.exists(bg_path):
-            for file in os.listdir(bg_path):
-                if file.endswith(('.png', '.jpg', '.jpeg')):
-                    try:
-                        img = pygame.image.load(os.path.join(bg_path, file))
-                        preview_img = pygame.transform.scale(img, (200, 150))
-                        bg_name = file.split('.')[0]
-                        
-                        backgrounds.append({
-                            'image': preview_img,
-                            'name': bg_name,
-                            'path': os.path.join(bg_path, file),
-                            'full_image': img
-                        })
-                        loaded_backgrounds.append(bg_name)
-                        print(f"Loaded background: {bg_name}")
-                        
-                    except Exception as e:
-                        print(f"Error loading background {file}: {e}")
-                        continue
+        
+        # The header index lists the images without decoding them
+        for file in folder_index(bg_path):
+            bg_name = file.split('.')[0]
+            backgrounds.append({
+                'image': self.create_placeholder_background(bg_name),  # until background_preview() has the real one
+                'name': bg_name,
+                'path': os.path.join(bg_path, file),
+                'full_image': None  # loaded from path when the fight starts
+            })
         
         # If no backgrounds found, create placeholders
         if not backgrounds:
@@ -198,6 +168,12 @@ class CharacterSelect:
         
         return backgrounds
     
+    def background_preview(self, bg):
+        """A stage's 200x150 preview, or its placeholder while the preview loads in the background"""
+        if not bg['path']:
+            return bg['image']
+        return prefetcher.ready_image(bg['path'], (200, 150)) or bg['image']
+    
     def create_placeholder_background(self, name):
         img = pygame.Surface((200, 150))
         
@@ -267,8 +243,7 @@ class CharacterSelect:
                 print(f"CharacterSelect: Trying to load: {bg_path}")
                 
                 if os.path.exists(bg_path):
-                    self.background_image = pygame.image.load(bg_path)
-                    self.background_image = pygame.transform.scale(self.background_image, (self.screen_width, self.screen_height))
+                    self.background_image = asset_manager.image(bg_path, (self.screen_width, self.screen_height))
                     print(f"CharacterSelect: Successfully loaded background: {bg_path}")
                 else:
                     print(f"CharacterSelect: File does not exist: {bg_path}")
@@ -409,7 +384,7 @@ class CharacterSelect:
                     surface.blit(p2_text, (x + 5, y + 5))
             
             # Draw character portrait
-            surface.blit(char['image'], (x, y))
+            surface.blit(self.portrait_image(char), (x, y))
             
             # Draw character name
             name_text = self.small_font.render(char['name'], True, (255, 255, 255))
@@ -471,7 +446,7 @@ class CharacterSelect:
             if self.selected_background == bg['name']:
                 pygame.draw.rect(surface, (255, 255, 0), (x-5, y-5, 210, 160), 3)
             
-            surface.blit(bg['image'], (x, y))
+            surface.blit(self.background_preview(bg), (x, y))
             
             name_text = self.small_font.render(bg['name'], True, (255, 255, 255))
             name_rect = name_text.get_rect(center=(x + 100, y + 165))
@@ -488,7 +463,8 @@ class CharacterSelect:
         else:
             return self.handle_background_click(pos)
     
-    def handle_character_click(self, pos):
+    def character_at(self, pos):
+        """Character whose portrait is under pos, or None"""
         cols = 4
         char_width = 110
         char_height = 130
@@ -503,21 +479,46 @@ class CharacterSelect:
             y = start_y + (i // cols) * char_height
             
             if x <= pos[0] <= x + 100 and y <= pos[1] <= y + 100:
-                if self.network_mode:
-                    # Network mode - only select for this player
-                    self.selected_chars[0] = char
-                else:
-                    # Local mode - select for current player
-                    if self.current_player == 0:
-                        self.selected_chars[0] = char
-                        self.current_player = 1
-                    elif self.current_player == 1:
-                        self.selected_chars[1] = char
-                        self.current_player = 2  # Both players selected
-                        # Auto-select a random background for fighting
-                        self.auto_select_background()
-                return True
-        return False
+                return char
+        return None
+    
+    def handle_mouse_motion(self, pos):
+        """Preload the sprites of the character under the mouse"""
+        if self.selection_phase != "characters":
+            return
+        char = self.character_at(pos)
+        if char and char['name'] != self.hovered_character:
+            self.hovered_character = char['name']
+            self.prefetch_character(char['name'])
+    
+    def handle_character_click(self, pos):
+        char = self.character_at(pos)
+        if char is None:
+            return False
+        
+        self.prefetch_character(char['name'])
+        if self.network_mode:
+            # Network mode - only select for this player
+            self.selected_chars[0] = char
+        else:
+            # Local mode - select for current player
+            if self.current_player == 0:
+                self.selected_chars[0] = char
+                self.current_player = 1
+                # Pick the stage now so it loads while player 2 chooses
+                self.next_background = self.get_random_background()
+                self.prefetch_background(self.next_background)
+            elif self.current_player == 1:
+                self.selected_chars[1] = char
+                self.current_player = 2  # Both players selected
+                # Auto-select a random background for fighting
+                self.auto_select_background()
+        return True
+    
+    def prefetch_background(self, background):
+        """Start loading a stage at screen size for the fight"""
+        if background.get('path'):
+            prefetcher.prefetch_image(background['path'], (self.screen_width, self.screen_height))
     
     def handle_background_click(self, pos):
         cols = 3
@@ -530,6 +531,7 @@ class CharacterSelect:
             
             if x <= pos[0] <= x + 200 and y <= pos[1] <= y + 150:
                 self.selected_background = bg['name']
+                self.prefetch_background(bg)
                 return True
         return False
     
@@ -665,10 +667,19 @@ class CharacterSelect:
                 'full_image': None
             }
 
+    def get_selected_background(self):
+        """The background entry for selected_background (a random one if none matches)"""
+        for bg in self.backgrounds:
+            if bg['name'] == self.selected_background:
+                return bg
+        return self.get_random_background()
+
     def auto_select_background(self):
         """Auto-select a random background when both characters are chosen"""
-        random_bg = self.get_random_background()
+        random_bg = self.next_background or self.get_random_background()
+        self.next_background = None
         self.selected_background = random_bg['name']
+        self.prefetch_background(random_bg)
         return random_bg
 
     def both_characters_selected(self):
@@ -1,11 +1,14 @@
 import socket
 import threading
-import pickle
 import pygame
 import sys
 import random
 from fighter import Fighter
+import simulation
+import controls
+from framing import MessageReader, send_message
 from character_select import CharacterSelect
+from asset_manager import asset_manager
 
 class GameClient:
     def __init__(self, server_host='localhost', server_port=12345):
@@ -41,15 +44,16 @@ class GameClient:
             return False
     
     def receive_messages(self):
+        reader = MessageReader()
         while self.running and self.connected:
             try:
-                data = self.socket.recv(4096)
-                if not data:
+                messages = reader.receive(self.socket)
+                if messages is None:
                     self.connected = False
                     break
                     
-                message = pickle.loads(data)
-                self.handle_server_message(message)
+                for message in messages:
+                    self.handle_server_message(message)
                 
             except Exception as e:
                 if self.running:
@@ -98,22 +102,20 @@ class GameClient:
                 'background': random_bg
             }
             try:
-                serialized_data = pickle.dumps(data)
-                self.socket.send(serialized_data)
+                send_message(self.socket, data)
                 self.my_character = character
                 print(f"Selected character: {character['name']}")
             except Exception as e:
                 print(f"Failed to send character selection: {e}")
     
-    def send_input(self, input_data):
+    def send_input(self, input_mask):
         if self.connected:
             data = {
                 'type': 'input',
-                'input': input_data
+                'input': controls.pack(input_mask)
             }
             try:
-                serialized_data = pickle.dumps(data)
-                self.socket.send(serialized_data)
+                send_message(self.socket, data)
             except Exception as e:
                 print(f"Failed to send input: {e}")
     
@@ -124,13 +126,12 @@ class GameClient:
                 'state': state_data
             }
             try:
-                serialized_data = pickle.dumps(data)
-                self.socket.send(serialized_data)
+                send_message(self.socket, data)
             except Exception as e:
                 print(f"Failed to send game state: {e}")
     
     def get_opponent_input(self):
-        return self.received_data.get('opponent_input', {})
+        return controls.unpack(self.received_data.get('opponent_input'))
     
     def get_opponent_state(self):
         return self.received_data.get('opponent_state', {})
@@ -157,6 +158,7 @@ class NetworkGame:
         self.character_select = CharacterSelect(self.screen_width, self.screen_height)
         self.character_select.set_network_mode(True)  # Enable network mode
         self.fighters = []
+        self.match = None
         self.background = None
         self.font = pygame.font.Font(None, 36)
         self.selection_confirmed = False
@@ -224,13 +226,13 @@ class NetworkGame:
                 # Send input to server
                 self.client.send_input(local_input)
                 
-                # Update fighters
-                local_fighter.move(self.screen_width, self.screen_height, self.screen,
-                                 opponent_fighter, False, local_input)
-                opponent_fighter.move(self.screen_width, self.screen_height, self.screen,
-                                    local_fighter, False, opponent_input)
+                # Step the simulation with both players' inputs
+                if self.client.player_number == 1:
+                    simulation.step(self.match, local_input, opponent_input)
+                else:
+                    simulation.step(self.match, opponent_input, local_input)
                 
-                # Update animations
+                # Refresh animation frames
                 for fighter in self.fighters:
                     fighter.update()
                 
@@ -269,6 +271,7 @@ class NetworkGame:
                           animation_steps, attack_sound, player2_char.get('special_skills', []))
         
         self.fighters = [fighter1, fighter2]
+        self.match = simulation.MatchState(fighter1.state, fighter2.state, self.screen_width, self.screen_height)
         
         # Load random background
         self.load_random_background()
@@ -314,8 +317,7 @@ class NetworkGame:
         
         for bg_path in bg_paths:
             try:
-                self.background = pygame.image.load(bg_path)
-                self.background = pygame.transform.scale(self.background, (self.screen_width, self.screen_height))
+                self.background = asset_manager.image(bg_path, (self.screen_width, self.screen_height))
                 return
             except:
                 continue
@@ -0,0 +1,40 @@
+"""
+Input bitmask shared by both players
+
+Each frame of input is one 16-bit mask of actions. The keyboard bindings
+for player 1 and player 2 (see Fighter in fighter.py) map onto the same
+bits, so the simulation and the network code never need to know which
+keys were pressed. On the wire a mask is 2 bytes in network byte order.
+"""
+import struct
+
+INPUT_LEFT = 1 << 0
+INPUT_RIGHT = 1 << 1
+INPUT_JUMP = 1 << 2
+INPUT_DOWN = 1 << 3  # Down/Block (unused currently)
+INPUT_ATTACK1 = 1 << 4
+INPUT_ATTACK2 = 1 << 5
+INPUT_SKILL1 = 1 << 6
+INPUT_SKILL2 = 1 << 7
+INPUT_SKILL3 = 1 << 8
+INPUT_SKILL4 = 1 << 9
+
+# Special skill bits in slot order
+INPUT_SKILLS = (INPUT_SKILL1, INPUT_SKILL2, INPUT_SKILL3, INPUT_SKILL4)
+
+NO_INPUT = 0
+INPUT_BYTES = 2
+
+_input_struct = struct.Struct('!H')
+
+
+def pack(mask):
+    """Encode an input mask as 2 bytes"""
+    return _input_struct.pack(mask)
+
+
+def unpack(data):
+    """Decode 2 bytes from pack(); missing data means no input"""
+    if not data:
+        return NO_INPUT
+    return _input_struct.unpack_from(data)[0]
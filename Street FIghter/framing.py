@@ -0,0 +1,145 @@
+"""
+Message framing shared by every game connection
+
+TCP delivers a byte stream, not messages: one recv() can return half a
+message, or several at once. Every message goes on the wire as a 4-byte
+big-endian length followed by its payload (see protocol.py for the
+message format), and MessageReader collects bytes until whole messages are
+available, however the stream was split.
+
+    send_message(sock, {'type': 'input', 'input': packed})
+
+    reader = MessageReader()
+    while True:
+        messages = reader.receive(sock)
+        if messages is None:
+            break  # peer closed the connection
+        for message in messages:
+            handle(message)
+"""
+import struct
+import threading
+import weakref
+
+from protocol import decode_message, encode_message
+
+HEADER = struct.Struct('!I')  # payload length
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024  # a longer length means the stream is corrupt
+RECV_SIZE = 65536
+
+_send_locks = weakref.WeakKeyDictionary()  # socket: lock, so frames from several threads never interleave
+_send_locks_lock = threading.Lock()
+
+
+class FramingError(ValueError):
+    """The byte stream is not a sequence of frames; the connection can't be trusted"""
+
+
+def encode(message):
+    """A message as one frame (length prefix and payload)"""
+    payload = encode_message(message)
+    return HEADER.pack(len(payload)) + payload
+
+
+def send_message(sock, message):
+    """Send one framed message; safe to call from several threads for the same socket"""
+    frame = encode(message)
+    with _send_lock(sock):
+        sock.sendall(frame)
+
+
+def _send_lock(sock):
+    with _send_locks_lock:
+        lock = _send_locks.get(sock)
+        if lock is None:
+            lock = _send_locks[sock] = threading.Lock()
+        return lock
+
+
+class MessageReader:
+    """Reassembles framed messages from a socket with one reusable buffer
+
+    Each receive() is a single recv_into() straight into the free end of the
+    buffer, after which every complete frame is decoded from a memoryview
+    slice, without copying it out. Bytes of an unfinished frame stay where
+    they are until the buffer end is reached, then move to the front; a
+    frame larger than the buffer grows it (at most to twice the largest frame
+    seen on the connection).
+    """
+
+    def __init__(self, size=RECV_SIZE):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # first byte not parsed yet
+        self.end = 0  # end of the received bytes
+
+    def receive(self, sock):
+        """Wait for data on sock; returns the messages it completes (maybe none), or None once the peer closed"""
+        received = sock.recv_into(self.read_buffer())
+        if not received:
+            return None
+        return self.received(received)
+
+    def read_buffer(self):
+        """The free end of the buffer, for a read that doesn't go through receive()"""
+        if self.end == len(self.buffer):
+            self._reserve(self.end - self.start + 1)
+        return self.view[self.end:]
+
+    def received(self, count):
+        """After count bytes were read into read_buffer(): the messages they complete, oldest first"""
+        self.end += count
+        return self._parse()
+
+    def feed(self, data):
+        """Add bytes received some other way; returns the messages they complete, oldest first"""
+        if len(self.buffer) - self.end < len(data):
+            self._reserve(self.end - self.start + len(data))
+        self.view[self.end:self.end + len(data)] = data
+        self.end += len(data)
+        return self._parse()
+
+    def _parse(self):
+        """Decode every complete frame in the buffer
+
+        A frame whose payload can't be decoded is reported and skipped; the
+        frames after it are unaffected. Raises FramingError for an impossible
+        length.
+        """
+        messages = []
+        while self.end - self.start >= HEADER.size:
+            size, = HEADER.unpack_from(self.buffer, self.start)
+            if size > MAX_MESSAGE_SIZE:
+                raise FramingError(f"Frame of {size} bytes is over the {MAX_MESSAGE_SIZE} byte limit")
+            frame_end = self.start + HEADER.size + size
+            if frame_end > self.end:
+                self._reserve(HEADER.size + size)  # make sure the rest of it will fit
+                break
+            try:
+                messages.append(decode_message(self.view[self.start + HEADER.size:frame_end]))
+            except Exception as e:
+                print(f"Dropping undecodable message: {e}")
+            self.start = frame_end
+        if self.start == self.end:
+            # Everything parsed (the usual case): start over at the front without copying
+            self.start = self.end = 0
+        return messages
+
+    def _reserve(self, needed):
+        """Room for needed bytes from the first unparsed one, moving or growing the buffer"""
+        if len(self.buffer) - self.start >= needed and self.end < len(self.buffer):
+            return
+        pending = self.end - self.start
+        if needed > len(self.buffer):
+            buffer = bytearray(max(needed, 2 * len(self.buffer)))
+            buffer[:pending] = self.view[self.start:self.end]
+            self._replace_buffer(buffer)
+        else:
+            self.buffer[:pending] = self.buffer[self.start:self.end]
+        self.start = 0
+        self.end = pending
+
+    def _replace_buffer(self, buffer):
+        self.view.release()  # before the old bytearray can go away
+        self.buffer = buffer
+        self.view = memoryview(buffer)
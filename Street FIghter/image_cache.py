@@ -0,0 +1,105 @@
+"""
+Disk cache of decoded images
+
+Decoding PNGs/JPEGs and scaling backgrounds to the screen gives the same
+pixels on every launch. load_image() keeps the final surface's raw pixels
+(pygame.image.tobytes format) in CACHE_DIR, keyed by the source path, its
+mtime and file size, the target size and whether it has alpha. A warm start
+maps the cache file and wraps it with pygame.image.frombuffer, so there is
+no decoding and no scaling.
+
+Pixels are stored as BGRA, the byte order of the usual 32-bit display
+format, so mapped surfaces are drawn as they are instead of being converted
+into a private copy. Every game process on the machine (launcher, client,
+room client, server) maps the same files, and the OS keeps one copy of
+their pixels for all of them.
+
+Entries for old versions of a file are never read again; delete CACHE_DIR
+to reclaim the space.
+"""
+import hashlib
+import mmap
+import os
+import struct
+
+import pygame
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.image_cache')  # shared by every process
+PIXEL_FORMAT = 'BGRA'
+MAGIC = b'SFIC'
+_entry_header = struct.Struct('!4sII')  # magic, width, height
+
+
+def load_image(path, size=None, alpha=False):
+    """pygame.image.load(path), scaled to size if given, through the disk cache
+
+    With alpha the surface keeps per-pixel alpha like convert_alpha(),
+    otherwise it is opaque like convert(). The surface stays backed by the
+    mapped cache file unless the display uses another pixel format, in which
+    case it is converted to that. Raises the same errors as pygame.image.load
+    for a missing or unreadable file.
+    """
+    cache_path = _cache_path(path, size, alpha)
+    surface = _read_entry(cache_path, alpha)
+    if surface is None:
+        surface = pygame.image.load(path)
+        if size:
+            surface = pygame.transform.scale(surface, size)
+        surface = _write_entry(cache_path, surface, alpha)
+
+    display = pygame.display.get_surface()
+    if display is None or (display.get_bitsize() == 32 and display.get_masks()[:3] == surface.get_masks()[:3]):
+        return surface
+    return surface.convert_alpha() if alpha else surface.convert()
+
+
+def _cache_path(path, size, alpha):
+    stat = os.stat(path)
+    key = repr((os.path.abspath(path), stat.st_mtime_ns, stat.st_size, tuple(size or ()), PIXEL_FORMAT, alpha))
+    return os.path.join(CACHE_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.raw')
+
+
+def _read_entry(cache_path, alpha):
+    """Surface over the mapped cache file, or None if there is no usable entry"""
+    try:
+        with open(cache_path, 'rb') as f:
+            # Copy-on-write: pages are shared with other processes until someone draws on the surface
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    except (OSError, ValueError):
+        return None
+    if len(data) < _entry_header.size:
+        return None
+    magic, width, height = _entry_header.unpack_from(data)
+    pixels = memoryview(data)[_entry_header.size:]
+    if magic != MAGIC or len(pixels) != width * height * len(PIXEL_FORMAT):
+        return None
+    # frombuffer keeps a reference to the mapping for as long as the surface lives
+    surface = pygame.image.frombuffer(pixels, (width, height), PIXEL_FORMAT)
+    if not alpha:
+        surface.set_alpha(None)  # opaque: blit as a plain copy, like convert()
+    return surface
+
+
+def _write_entry(cache_path, surface, alpha):
+    """Store a surface and return it mapped from the new entry (a private copy if it could not be stored)"""
+    # Through RGBA/RGB first: tobytes only applies a colorkey (paletted PNGs) for those
+    staged_format = 'RGBA' if alpha else 'RGB'
+    staged = pygame.image.frombuffer(pygame.image.tobytes(surface, staged_format), surface.get_size(), staged_format)
+    pixels = pygame.image.tobytes(staged, PIXEL_FORMAT)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(_entry_header.pack(MAGIC, surface.get_width(), surface.get_height()))
+            f.write(pixels)
+        os.replace(temp_path, cache_path)  # other game processes never see half an entry
+    except OSError as e:
+        print(f"Could not cache {cache_path}: {e}")
+    else:
+        mapped = _read_entry(cache_path, alpha)
+        if mapped is not None:
+            return mapped
+    surface = pygame.image.frombytes(pixels, surface.get_size(), PIXEL_FORMAT)
+    if not alpha:
+        surface.set_alpha(None)
+    return surface
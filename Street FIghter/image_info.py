@@ -0,0 +1,89 @@
+"""
+Image dimensions without decoding
+
+Finding a character's sprite sheet used to decode every image in its folder
+just to look at the size. read_image_info() gets the width, height and
+format from the PNG or JPEG header instead, reading a few hundred bytes.
+folder_index() keeps that for every image in a folder and only reads the
+headers of files that are new or changed since the last call.
+"""
+import os
+import struct
+import threading
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# JPEG start-of-frame markers (C4, C8 and CC are other segments)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+JPEG_MAX_SCAN = 1024 * 1024  # give up on a JPEG with no frame header in the first megabyte
+
+_indexes = {}  # folder path: {file name: (mtime_ns, file size, info)}
+_lock = threading.Lock()
+
+
+def read_image_info(path):
+    """(width, height, 'png' or 'jpeg') from the file header, or None if it is neither"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(24)
+            if head.startswith(PNG_SIGNATURE) and head[12:16] == b'IHDR':
+                width, height = struct.unpack('!II', head[16:24])
+                return (width, height, 'png')
+            if head.startswith(b'\xff\xd8'):
+                f.seek(2)
+                return _read_jpeg_info(f)
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def _read_jpeg_info(f):
+    while f.tell() < JPEG_MAX_SCAN:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        while marker == b'\xff':  # fill bytes
+            marker = f.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue  # markers without a segment
+        length, = struct.unpack('!H', f.read(2))
+        if marker in JPEG_SOF_MARKERS:
+            _, height, width = struct.unpack('!BHH', f.read(5))
+            return (width, height, 'jpeg')
+        f.seek(length - 2, os.SEEK_CUR)
+    return None
+
+
+def folder_index(folder):
+    """{file name: (width, height, format)} for the PNG/JPEG images in a folder
+
+    Header reads are remembered per folder and redone only for files whose
+    modification time or size changed. Unreadable images are left out.
+    """
+    folder = os.path.abspath(folder)
+    try:
+        names = [name for name in os.listdir(folder) if name.lower().endswith(IMAGE_EXTENSIONS)]
+    except OSError:
+        return {}
+    with _lock:
+        cached = _indexes.get(folder, {})
+    entries = {}
+    for name in names:
+        try:
+            stat = os.stat(os.path.join(folder, name))
+        except OSError:
+            continue
+        entry = cached.get(name)
+        if entry is None or entry[:2] != (stat.st_mtime_ns, stat.st_size):
+            entry = (stat.st_mtime_ns, stat.st_size, read_image_info(os.path.join(folder, name)))
+        entries[name] = entry
+    with _lock:
+        _indexes[folder] = entries
+    return {name: entry[2] for name, entry in entries.items() if entry[2] is not None}
+
@@ -21,8 +21,9 @@ def print_menu():
     print("6. Start Room-Based Server")
     print("7. Start Room Client")
     print("8. Start Dedicated Server")
-    print("9. Help & Troubleshooting")
-    print("10. Exit")
+    print("9. Run Balance Simulation")
+    print("10. Help & Troubleshooting")
+    print("11. Exit")
     print("=" * 60)
 
 def get_local_ip():
@@ -134,6 +135,14 @@ LAN CONNECTION:
 • Joining player: Select 'Join LAN Game' and pick host
 • If auto-discovery fails, use manual IP entry
 
+BALANCE SIMULATION:
+• Plays every character pairing headless and reports win rates
+• Needs numpy (pip install numpy)
+""")
+    
+    print("\nPress Enter to continue...")
+    input()
+
 def scan_lan_games():
     """Scan for available LAN games"""
     print("\n" + "=" * 40)
@@ -205,6 +214,26 @@ def start_client():
     except Exception as e:
         print(f"Error starting client: {e}")
 
+def run_balance_simulation():
+    """Launch the headless balance simulation"""
+    print("\n" + "=" * 40)
+    print("Balance Simulation")
+    print("=" * 40)
+    matches = input("Matches per pairing (default: 200): ").strip() or "200"
+    policy = input("Input policy - random, scripted or input log file (default: scripted): ").strip() or "scripted"
+    
+    try:
+        matches = int(matches)
+        script_path = os.path.join(os.path.dirname(__file__), "balance_sim.py")
+        subprocess.run([sys.executable, script_path, str(matches), policy])
+    except ValueError:
+        print("Invalid number of matches!")
+    except Exception as e:
+        print(f"Error during balance simulation: {e}")
+    
+    print("\nPress Enter to continue...")
+    input()
+
 def start_local_game():
     main_path = os.path.join(os.path.dirname(__file__), "main.py")
     subprocess.run([sys.executable, main_path])
@@ -226,7 +255,7 @@ def main():
     while True:
         print_menu()
         print(f"Your IP: {get_local_ip()}")
-        choice = input("\nEnter your choice (1-10): ").strip()
+        choice = input("\nEnter your choice (1-11): ").strip()
         
         if choice == "1":
             if launch_main_game():
@@ -244,16 +273,18 @@ def main():
         elif choice == "7":
             start_room_client()
         elif choice == "8":
-            start_dedicated_server()
+            start_server()
         elif choice == "9":
-            show_help()
+            run_balance_simulation()
         elif choice == "10":
+            show_help()
+        elif choice == "11":
             print("Goodbye!")
             break
         elif choice.lower() == "help":
             show_help()
         else:
-            print("Invalid choice! Please select 1-10. Type 'help' for more info.")
+            print("Invalid choice! Please select 1-11. Type 'help' for more info.")
         
         print("\n")
 
@@ -1,8 +1,13 @@
 import pygame
 import sys
-import time
 import os
 from fighter import Fighter
+import simulation
+import controls
+import rollback
+import replay
+from asset_manager import asset_manager
+from asset_prefetch import prefetcher
 from character_select import CharacterSelect
 from network_manager import NetworkManager
 from sprite_loader import sprite_loader
@@ -13,6 +18,7 @@ pygame.init()
 SCREEN_WIDTH = 1000
 SCREEN_HEIGHT = 600
 FPS = 60
+REPLAY_SKIP = 5 * FPS  # frames skipped by the arrow keys while watching a replay
 
 # Initialize display
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
@@ -20,13 +26,19 @@ pygame.display.set_caption("Street Fighter Network")
 clock = pygame.time.Clock()
 
 class Game:
-    def __init__(self):
-        self.state = "menu"  # menu, lan_scan, ip_input, local_game, network_host, character_select, waiting, playing
+    def __init__(self, record_replays=False):
+        self.state = "menu"  # menu, lan_scan, ip_input, local_game, network_host, character_select, waiting, playing, replay
         self.character_select = CharacterSelect(SCREEN_WIDTH, SCREEN_HEIGHT)
         self.network_manager = None
         self.is_host = False
         self.is_network_game = False
         self.fighters = []
+        self.match = None
+        self.rollback = None
+        self.record_replays = record_replays
+        self.recorder = None
+        self.replay = None
+        self.replay_frame = 0
         self.background = None
         self.font = pygame.font.Font(None, 48)
         self.menu_font = pygame.font.Font(None, 36)
@@ -75,16 +87,26 @@ class Game:
                         else:
                             if event.unicode.isprintable():
                                 self.manual_ip += event.unicode
+                    elif self.state == "replay":
+                        if event.key == pygame.K_RIGHT:
+                            self.seek_replay(self.replay_frame + REPLAY_SKIP)
+                        elif event.key == pygame.K_LEFT:
+                            self.seek_replay(self.replay_frame - REPLAY_SKIP)
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     if self.state == "character_select":
                         self.character_select.handle_click(event.pos)
                         if self.character_select.is_selection_complete():
                             self.start_game()
+                elif event.type == pygame.MOUSEMOTION:
+                    if self.state == "character_select":
+                        self.character_select.handle_mouse_motion(event.pos)
             
             self.update()
             self.draw()
             clock.tick(FPS)
         
+        self.stop_recording()
+        prefetcher.shutdown()
         if self.network_manager:
             self.network_manager.close()
         pygame.quit()
@@ -166,6 +188,7 @@ class Game:
         if self.is_network_game and self.network_manager:
             # Send character selection to other player
             selection_data = {
+                'type': 'selection',
                 'characters': self.character_select.selected_chars,
                 'background': self.character_select.selected_background
             }
@@ -178,14 +201,30 @@ class Game:
         # Load character data and sprites using the new sprite loader
         char1_name = char1['name'] if char1 else 'Kunoichi'
         char2_name = char2['name'] if char2 else 'Lightning Mage'
+        self.fighters = self.create_fighters(char1_name, char2_name)
+        self.match = simulation.MatchState(self.fighters[0].state, self.fighters[1].state, SCREEN_WIDTH, SCREEN_HEIGHT)
+        if self.is_network_game:
+            self.rollback = rollback.RollbackSession(self.match, 0 if self.is_host else 1)
+        
+        # Load background
+        self.load_background(self.character_select.selected_background)
         
+        if self.record_replays:
+            self.start_recording([char1_name, char2_name], self.character_select.selected_background)
+        
+        print(asset_manager.report())
+        self.state = "playing"
+    
+    def create_fighters(self, char1_name, char2_name):
+        """Create both fighters with sprites and skills from the sprite loader"""
         # Get character configurations
         fighter1_data = sprite_loader.get_character_data(char1_name)
         fighter2_data = sprite_loader.get_character_data(char2_name)
         
-        # Load sprite sheets
-        sprite_sheet1 = sprite_loader.create_sprite_sheet_from_animations(char1_name)
-        sprite_sheet2 = sprite_loader.create_sprite_sheet_from_animations(char2_name)
+        # Load animation frames (scaled once by the sprite loader, usually
+        # already prefetched while the characters were being picked)
+        animations1 = prefetcher.character_animations(char1_name)
+        animations2 = prefetcher.character_animations(char2_name)
         
         # Get frame counts for animations
         char1_sprite_data = sprite_loader.load_character_sprites(char1_name)
@@ -202,17 +241,55 @@ class Game:
         attack_sound = None
         
         # Create fighters with proper sprites and skills
-        fighter1 = Fighter(1, 200, 310, False, fighter1_data, sprite_sheet1, 
+        fighter1 = Fighter(1, 200, 310, False, fighter1_data, animations1, 
                           animation_steps1, attack_sound, char1_skills)
-        fighter2 = Fighter(2, 700, 310, True, fighter2_data, sprite_sheet2, 
+        fighter2 = Fighter(2, 700, 310, True, fighter2_data, animations2, 
                           animation_steps2, attack_sound, char2_skills)
         
-        self.fighters = [fighter1, fighter2]
-        
-        # Load background
-        self.load_background(self.character_select.selected_background)
+        return [fighter1, fighter2]
+    
+    def start_recording(self, names, background):
+        """Record the match that is starting to a new replay file"""
+        self.stop_recording()
+        try:
+            header = replay.match_header(self.match, names, background)
+            self.recorder = replay.ReplayRecorder(replay.new_replay_path(), header, self.match)
+        except OSError as e:
+            print(f"Could not start replay recording: {e}")
+            return
+        if self.rollback:
+            self.rollback.recorder = self.recorder
+    
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+    
+    def start_replay(self, path):
+        """Watch a recorded match at normal speed"""
+        try:
+            self.replay = replay.load_replay(path)
+        except (OSError, ValueError) as e:
+            print(f"Could not load replay: {e}")
+            return False
         
-        self.state = "playing"
+        self.fighters = self.create_fighters(*self.replay.names)
+        self.match = self.replay.new_match()
+        # Simulate with the recorded setup; the sprites only draw it
+        for fighter, state in zip(self.fighters, self.match.fighters):
+            fighter.state = state
+        self.replay_frame = 0
+        self.load_background(self.replay.header.get('background') or 'default')
+        self.state = "replay"
+        print(f"Playing replay: {' vs '.join(self.replay.names)} ({self.replay.frame_count} frames)")
+        return True
+    
+    def seek_replay(self, frame):
+        """Jump to a frame of the replay (nearest keyframe plus a few simulated frames)"""
+        self.replay.seek(self.match, frame)
+        self.replay_frame = self.match.frame
+        for fighter in self.fighters:
+            fighter.update()
     
     def load_background(self, bg_name):
         try:
@@ -228,8 +305,7 @@ class Game:
             background_loaded = False
             for path in possible_paths:
                 if os.path.exists(path):
-                    self.background = pygame.image.load(path)
-                    self.background = pygame.transform.scale(self.background, (SCREEN_WIDTH, SCREEN_HEIGHT))
+                    self.background = prefetcher.image(path, (SCREEN_WIDTH, SCREEN_HEIGHT))
                     background_loaded = True
                     print(f"Loaded background from: {path}")
                     break
@@ -255,65 +331,41 @@ class Game:
             
         if self.state == "playing" and self.fighters:
             if self.is_network_game and self.network_manager and self.network_manager.connected:
-                # Network game logic with improved synchronization
+                # Rollback network play: only inputs are exchanged, every
+                # peer runs the whole simulation (see rollback.py)
                 local_player = 0 if self.is_host else 1
-                remote_player = 1 if self.is_host else 0
-                
-                # Get local input
-                local_input = self.fighters[local_player].get_input_state()
-                
-                # Create game state data
-                game_state = {
-                    'type': 'game_state',
-                    'input': local_input,
-                    'player_data': {
-                        'rect': [self.fighters[local_player].rect.x, self.fighters[local_player].rect.y],
-                        'health': self.fighters[local_player].health,
-                        'action': self.fighters[local_player].action,
-                        'frame_index': self.fighters[local_player].frame_index,
-                        'vel_y': self.fighters[local_player].vel_y,
-                        'alive': self.fighters[local_player].alive,
-                        'flip': self.fighters[local_player].flip
-                    },
-                    'timestamp': time.time()
-                }
                 
-                # Send to other player
-                self.network_manager.send_data(game_state)
+                for message in self.network_manager.get_messages():
+                    if message.get('type') == 'input':
+                        self.rollback.add_remote_input(message['frame'], controls.unpack(message['input']))
                 
-                # Get remote data
-                remote_data = self.network_manager.get_received_data()
-                remote_input = {}
-                
-                if remote_data and remote_data.get('type') == 'game_state':
-                    remote_input = remote_data.get('input', {})
-                    
-                    # Update remote player state for better synchronization
-                    remote_player_data = remote_data.get('player_data', {})
-                    if remote_player_data:
-                        # Smooth interpolation for better network feel
-                        current_x = self.fighters[remote_player].rect.x
-                        target_x = remote_player_data.get('rect', [current_x, 0])[0]
-                        
-                        # Simple interpolation
-                        if abs(target_x - current_x) > 5:  # Only interpolate if difference is significant
-                            self.fighters[remote_player].rect.x = int(current_x * 0.8 + target_x * 0.2)
-                        
-                        # Update other critical state
-                        self.fighters[remote_player].health = remote_player_data.get('health', 100)
-                        self.fighters[remote_player].alive = remote_player_data.get('alive', True)
+                local_input = self.fighters[local_player].get_input_state()
+                frame = self.rollback.frame
+                if not self.rollback.advance(local_input):
+                    return  # too far ahead of the other player, wait for their inputs
                 
-                # Update fighters with inputs
-                self.fighters[local_player].move(SCREEN_WIDTH, SCREEN_HEIGHT, screen, 
-                                               self.fighters[remote_player], False, local_input)
-                self.fighters[remote_player].move(SCREEN_WIDTH, SCREEN_HEIGHT, screen, 
-                                                self.fighters[local_player], False, remote_input)
+                self.network_manager.send_data({
+                    'type': 'input',
+                    'frame': frame,
+                    'input': controls.pack(local_input)
+                })
             else:
                 # Local game logic - both players on same machine
-                self.fighters[0].move(SCREEN_WIDTH, SCREEN_HEIGHT, screen, self.fighters[1], False)
-                self.fighters[1].move(SCREEN_WIDTH, SCREEN_HEIGHT, screen, self.fighters[0], False)
+                p1_input = self.fighters[0].get_input_state()
+                p2_input = self.fighters[1].get_input_state()
+                simulation.step(self.match, p1_input, p2_input)
+                if self.recorder:
+                    self.recorder.record(p1_input, p2_input)
             
-            # Update fighter animations
+            # Refresh fighter animation frames
+            for fighter in self.fighters:
+                fighter.update()
+        
+        elif self.state == "replay" and self.replay_frame < self.replay.frame_count:
+            # Feed the recorded inputs; the last frame stays on screen at the end
+            p1_input, p2_input = self.replay.inputs[self.replay_frame]
+            simulation.step(self.match, p1_input, p2_input)
+            self.replay_frame += 1
             for fighter in self.fighters:
                 fighter.update()
     
@@ -386,7 +438,7 @@ class Game:
         elif self.state == "character_select":
             self.character_select.draw(screen)
             
-        elif self.state == "playing":
+        elif self.state in ("playing", "replay"):
             # Draw background
             if self.background:
                 screen.blit(self.background, (0, 0))
@@ -483,5 +535,10 @@ class Game:
         pygame.display.flip()
 
 if __name__ == "__main__":
-    game = Game()
+    # python main.py [--record] [--replay <file>]
+    game = Game(record_replays='--record' in sys.argv)
+    if '--replay' in sys.argv:
+        replay_index = sys.argv.index('--replay') + 1
+        if replay_index < len(sys.argv):
+            game.start_replay(sys.argv[replay_index])
     game.run()
\ No newline at end of file
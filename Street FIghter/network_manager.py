@@ -1,9 +1,9 @@
 import socket
 import threading
-import pickle
 import time
-import struct
 import json
+from collections import deque
+from framing import MessageReader, send_message
 
 class NetworkManager:
     def __init__(self, is_host=True, host=None, port=12345):
@@ -15,9 +15,8 @@ class NetworkManager:
         self.connected = False
         self.game_data = {}
         self.received_data = {}
+        self.message_queue = deque()  # every message in arrival order, see get_messages()
         self.running = True
-        self.receive_buffer = b''
-        self.send_lock = threading.Lock()
         
     def get_local_ip(self):
         """Get the local IP address for LAN connectivity"""
@@ -124,51 +123,38 @@ class NetworkManager:
     def send_data(self, data):
         if self.connected and self.connection:
             try:
-                with self.send_lock:
-                    serialized_data = pickle.dumps(data)
-                    # Send size first, then data (message framing)
-                    message_size = len(serialized_data)
-                    size_bytes = struct.pack('!I', message_size)
-                    self.connection.send(size_bytes + serialized_data)
+                send_message(self.connection, data)
             except Exception as e:
                 print(f"Error sending data: {e}")
                 self.connected = False
     
     def receive_data(self):
+        reader = MessageReader()
         while self.running and self.connected:
             try:
-                # First, get the message size (4 bytes)
-                size_data = self._receive_exact(4)
-                if not size_data:
+                messages = reader.receive(self.connection)
+                if messages is None:
                     break
                     
-                message_size = struct.unpack('!I', size_data)[0]
-                
-                # Then receive the exact amount of data
-                message_data = self._receive_exact(message_size)
-                if not message_data:
-                    break
-                    
-                self.received_data = pickle.loads(message_data)
+                for message in messages:
+                    self.received_data = message
+                    self.message_queue.append(message)
                 
             except Exception as e:
                 print(f"Error receiving data: {e}")
                 self.connected = False
                 break
     
-    def _receive_exact(self, size):
-        """Receive exactly 'size' bytes from the socket"""
-        data = b''
-        while len(data) < size:
-            chunk = self.connection.recv(size - len(data))
-            if not chunk:
-                return None
-            data += chunk
-        return data
-    
     def get_received_data(self):
         return self.received_data
     
+    def get_messages(self):
+        """Take every message received since the last call, oldest first"""
+        messages = []
+        while self.message_queue:
+            messages.append(self.message_queue.popleft())
+        return messages
+    
     def close(self):
         self.running = False
         self.connected = False
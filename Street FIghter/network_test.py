@@ -81,7 +81,7 @@ def test_client_connection(host_ip, timeout=5):
         print(f"Connected successfully in {end_time - start_time:.2f} seconds")
         
         # Test sending data
-        test_data = {"test": "hello", "timestamp": time.time()}
+        test_data = {"type": "ping", "timestamp": time.time()}
         nm.send_data(test_data)
         print("Test data sent")
         
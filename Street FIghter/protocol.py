@@ -0,0 +1,386 @@
+"""
+Binary message format for every game connection
+
+Messages stay plain dicts with a 'type' key in the game code; this module
+turns them into compact payloads (framing.py adds the length prefix) and
+back. Unlike pickle, decoding only ever builds numbers, strings, lists and
+dicts, so a client on the LAN can't make the server run code.
+
+Payload layout (all integers big-endian):
+    protocol version (B), message type id (B), body
+
+Messages sent every frame have a fixed struct body:
+    input           frame (I), input mask (H)
+    player_input    player id (B), input mask (H)
+    game_input      input mask (H), fighter state
+    opponent_input  role (B, 0 host / 1 guest), input mask (H), fighter state
+    game_state      fighter state
+    sync_state      player id (B), fighter state
+    fighter state = x (i), y (i), health (h), action (B), frame index (H), flip (?)
+
+Every other message is a record: its schema fields in order, each as a
+tagged value (one tag byte, then the value; variable-length integers for
+lengths and ints). Fields the message doesn't have are sent as a single
+MISSING tag and left out again on decode; keys that aren't in the schema
+(say a character's portrait Surface) are not sent at all.
+
+Type ids are never reused: a changed body gets a new id, and a change to
+this layout bumps PROTOCOL_VERSION. A payload from another version, or of an
+unknown type, raises ProtocolError.
+"""
+import struct
+
+import controls
+
+PROTOCOL_VERSION = 1
+MAX_DEPTH = 16  # nested lists/dicts in one value
+INT_MIN, INT_MAX = -2 ** 63, 2 ** 63 - 1  # what a varint reader accepts
+
+_header = struct.Struct('!BB')
+_float = struct.Struct('!d')
+_fighter_state = '!iihBH?'  # see fighter state above
+
+ROLES = ('host', 'guest')
+
+# Value tags
+MISSING = 0
+NONE = 1
+FALSE = 2
+TRUE = 3
+INT = 4  # zigzag varint
+FLOAT = 5
+STR = 6  # varint length, UTF-8
+BYTES = 7  # varint length, raw
+LIST = 8  # varint count, values
+DICT = 9  # varint count, key/value pairs
+RECORD = 10  # the record's fields in schema order
+
+
+class ProtocolError(ValueError):
+    """A message that can't be encoded, or a payload that isn't a valid message"""
+
+
+def _write_varint(out, n):
+    while n > 0x7F:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(data, pos):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+        if shift > 63:
+            raise ProtocolError("Integer too long")
+
+
+class Value:
+    """Any None/bool/int/float/str/bytes, or lists and dicts of them"""
+
+    def write(self, out, value, depth=0):
+        if value is None:
+            out.append(NONE)
+        elif value is True:
+            out.append(TRUE)
+        elif value is False:
+            out.append(FALSE)
+        elif isinstance(value, int):
+            if not INT_MIN <= value <= INT_MAX:
+                raise ProtocolError(f"Integer {value} is out of the 64-bit range")
+            out.append(INT)
+            _write_varint(out, value << 1 if value >= 0 else (~value << 1) | 1)
+        elif isinstance(value, float):
+            out.append(FLOAT)
+            out += _float.pack(value)
+        elif isinstance(value, str):
+            encoded = value.encode('utf-8')
+            out.append(STR)
+            _write_varint(out, len(encoded))
+            out += encoded
+        elif isinstance(value, (bytes, bytearray)):
+            out.append(BYTES)
+            _write_varint(out, len(value))
+            out += value
+        elif depth >= MAX_DEPTH:
+            raise ProtocolError(f"Value nested more than {MAX_DEPTH} deep")
+        elif isinstance(value, (list, tuple)):
+            out.append(LIST)
+            _write_varint(out, len(value))
+            for item in value:
+                self.write(out, item, depth + 1)
+        elif isinstance(value, dict):
+            out.append(DICT)
+            _write_varint(out, len(value))
+            for key, item in value.items():
+                self.write(out, key, depth + 1)
+                self.write(out, item, depth + 1)
+        else:
+            raise ProtocolError(f"Can't send a {type(value).__name__}")
+
+    def read(self, data, pos, depth=0):
+        tag = data[pos]
+        pos += 1
+        if tag == NONE:
+            return None, pos
+        if tag == TRUE:
+            return True, pos
+        if tag == FALSE:
+            return False, pos
+        if tag == INT:
+            n, pos = _read_varint(data, pos)
+            return (n >> 1) ^ -(n & 1), pos
+        if tag == FLOAT:
+            return _float.unpack_from(data, pos)[0], pos + _float.size
+        if tag in (STR, BYTES):
+            length, pos = _read_varint(data, pos)
+            end = pos + length
+            if end > len(data):
+                raise ProtocolError("String runs past the end of the message")
+            raw = bytes(data[pos:end])
+            return (raw.decode('utf-8') if tag == STR else raw), end
+        if depth >= MAX_DEPTH:
+            raise ProtocolError(f"Value nested more than {MAX_DEPTH} deep")
+        if tag == LIST:
+            count, pos = _read_varint(data, pos)
+            items = []
+            for _ in range(count):
+                item, pos = self.read(data, pos, depth + 1)
+                items.append(item)
+            return items, pos
+        if tag == DICT:
+            count, pos = _read_varint(data, pos)
+            items = {}
+            for _ in range(count):
+                key, pos = self.read(data, pos, depth + 1)
+                if isinstance(key, (list, dict)):
+                    raise ProtocolError("Unhashable dict key")
+                items[key], pos = self.read(data, pos, depth + 1)
+            return items, pos
+        raise ProtocolError(f"Unknown value tag {tag}")
+
+
+class Record:
+    """A dict with known keys, sent as its values in schema order without the keys"""
+
+    def __init__(self, *fields):
+        # A field is a key (sent as a Value) or (key, codec)
+        self.fields = [(field, VALUE) if isinstance(field, str) else field for field in fields]
+
+    def write(self, out, value, depth=0):
+        if value is None:
+            out.append(NONE)
+            return
+        out.append(RECORD)
+        self.write_fields(out, value, depth)
+
+    def write_fields(self, out, value, depth=0):
+        if not isinstance(value, dict):
+            raise ProtocolError(f"Expected a dict, got a {type(value).__name__}")
+        for key, codec in self.fields:
+            if key in value:
+                codec.write(out, value[key], depth + 1)
+            else:
+                out.append(MISSING)
+
+    def read(self, data, pos, depth=0):
+        tag = data[pos]
+        if tag == NONE:
+            return None, pos + 1
+        if tag != RECORD:
+            raise ProtocolError(f"Expected a record, got tag {tag}")
+        return self.read_fields(data, pos + 1, depth)
+
+    def read_fields(self, data, pos, depth=0):
+        if depth >= MAX_DEPTH:
+            raise ProtocolError(f"Value nested more than {MAX_DEPTH} deep")
+        value = {}
+        for key, codec in self.fields:
+            if data[pos] == MISSING:
+                pos += 1
+            else:
+                value[key], pos = codec.read(data, pos, depth + 1)
+        return value, pos
+
+
+class ListOf:
+    """A list whose items all use one codec"""
+
+    def __init__(self, codec):
+        self.codec = codec
+
+    def write(self, out, value, depth=0):
+        if not isinstance(value, (list, tuple)):
+            raise ProtocolError(f"Expected a list, got a {type(value).__name__}")
+        out.append(LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            self.codec.write(out, item, depth + 1)
+
+    def read(self, data, pos, depth=0):
+        tag = data[pos]
+        if tag != LIST:
+            raise ProtocolError(f"Expected a list, got tag {tag}")
+        count, pos = _read_varint(data, pos + 1)
+        items = []
+        for _ in range(count):
+            item, pos = self.codec.read(data, pos, depth + 1)
+            items.append(item)
+        return items, pos
+
+
+VALUE = Value()
+CHARACTER = Record('name', 'special_skills')
+ROOM_INFO = Record('room_id', 'room_name', 'room_code', 'host_nickname', 'player_count',
+                   'max_players', 'is_full', 'is_private', 'phase')
+
+
+# Fixed-layout messages: (struct format, message -> struct values, struct values -> message)
+def _state_values(state):
+    x, y = state.get('rect', (0, 0))
+    return (x, y, state.get('health', 0), state.get('action', 0),
+            state.get('frame_index', 0), state.get('flip', False))
+
+
+def _state(values):
+    x, y, health, action, frame_index, flip = values
+    return {'rect': [x, y], 'health': health, 'action': action,
+            'frame_index': frame_index, 'flip': flip}
+
+
+def _mask(message):
+    return controls.unpack(message.get('input'))
+
+
+FIXED_MESSAGES = {
+    'input': ('!IH',
+              lambda m: (m.get('frame', 0), _mask(m)),
+              lambda v: {'frame': v[0], 'input': controls.pack(v[1])}),
+    'player_input': ('!BH',
+                     lambda m: (m['player_id'], _mask(m)),
+                     lambda v: {'player_id': v[0], 'input': controls.pack(v[1])}),
+    'game_input': ('!H' + _fighter_state[1:],
+                   lambda m: (_mask(m),) + _state_values(m.get('game_state', {})),
+                   lambda v: {'input': controls.pack(v[0]), 'game_state': _state(v[1:])}),
+    'opponent_input': ('!BH' + _fighter_state[1:],
+                       lambda m: (ROLES.index(m['role']), _mask(m)) + _state_values(m.get('game_state', {})),
+                       lambda v: {'role': ROLES[v[0]], 'input': controls.pack(v[1]), 'game_state': _state(v[2:])}),
+    'game_state': (_fighter_state,
+                   lambda m: _state_values(m['state']),
+                   lambda v: {'state': _state(v)}),
+    'sync_state': ('!B' + _fighter_state[1:],
+                   lambda m: (m['player_id'],) + _state_values(m['state']),
+                   lambda v: {'player_id': v[0], 'state': _state(v[1:])}),
+}
+
+RECORD_MESSAGES = {
+    # Room server
+    'set_nickname': Record('nickname'),
+    'nickname_set': Record('nickname'),
+    'create_room': Record('room_name', 'is_private'),
+    'room_created': Record(('room_info', ROOM_INFO), 'role'),
+    'join_room': Record('room_id'),
+    'room_joined': Record(('room_info', ROOM_INFO), 'role'),
+    'join_by_code': Record('room_code'),
+    'player_joined': Record(('room_info', ROOM_INFO), 'players'),
+    'leave_room': Record(),
+    'player_left': Record(('room_info', ROOM_INFO), 'left_player'),
+    'get_room_list': Record(),
+    'room_list': Record(('rooms', ListOf(ROOM_INFO))),
+    'room_chat': Record('message', 'sender', 'timestamp'),
+    'character_select': Record(('character', CHARACTER), 'background'),
+    'character_selected': Record('role', ('character', CHARACTER)),
+    'player_ready': Record('ready'),
+    'game_start': Record('background', 'players'),
+    'error': Record('message'),
+    # Matchmaking server
+    'match_found': Record('session_id', 'player_number'),
+    'opponent_disconnected': Record(),
+    # Direct LAN peers
+    'selection': Record(('characters', ListOf(CHARACTER)), 'background'),
+    'ping': Record('timestamp'),
+}
+
+# Wire ids: append only, never renumber or reuse
+TYPE_IDS = {
+    'input': 1,
+    'player_input': 2,
+    'game_input': 3,
+    'opponent_input': 4,
+    'game_state': 5,
+    'sync_state': 6,
+    'set_nickname': 16,
+    'nickname_set': 17,
+    'create_room': 18,
+    'room_created': 19,
+    'join_room': 20,
+    'room_joined': 21,
+    'join_by_code': 22,
+    'player_joined': 23,
+    'leave_room': 24,
+    'player_left': 25,
+    'get_room_list': 26,
+    'room_list': 27,
+    'room_chat': 28,
+    'character_select': 29,
+    'character_selected': 30,
+    'player_ready': 31,
+    'game_start': 32,
+    'error': 33,
+    'match_found': 34,
+    'opponent_disconnected': 35,
+    'selection': 36,
+    'ping': 37,
+}
+
+# type name: (type id, struct, to values, from values)
+_fixed = {name: (TYPE_IDS[name], struct.Struct(format), to_values, from_values)
+          for name, (format, to_values, from_values) in FIXED_MESSAGES.items()}
+# type id: (type name, struct or None, from values or Record)
+_decoders = {TYPE_IDS[name]: (name, body, from_values) for name, (_, body, _, from_values) in _fixed.items()}
+_decoders.update((TYPE_IDS[name], (name, None, record)) for name, record in RECORD_MESSAGES.items())
+
+
+def encode_message(message):
+    """The payload for a message dict"""
+    name = message.get('type')
+    fixed = _fixed.get(name)
+    if fixed:
+        type_id, body, to_values, _ = fixed
+        try:
+            return _header.pack(PROTOCOL_VERSION, type_id) + body.pack(*to_values(message))
+        except (struct.error, KeyError, ValueError, TypeError) as e:
+            raise ProtocolError(f"Bad {name} message: {e}") from e
+    if name not in RECORD_MESSAGES:
+        raise ProtocolError(f"Unknown message type {name!r}")
+    out = bytearray(_header.pack(PROTOCOL_VERSION, TYPE_IDS[name]))
+    RECORD_MESSAGES[name].write_fields(out, message)
+    return bytes(out)
+
+
+def decode_message(payload):
+    """The message dict for a payload (bytes or memoryview); raises ProtocolError if it is malformed"""
+    try:
+        version, type_id = _header.unpack_from(payload)
+        if version != PROTOCOL_VERSION:
+            raise ProtocolError(f"Protocol version {version}, expected {PROTOCOL_VERSION}")
+        if type_id not in _decoders:
+            raise ProtocolError(f"Unknown message type id {type_id}")
+        name, body, decoder = _decoders[type_id]
+        if body:
+            if len(payload) != _header.size + body.size:
+                raise ProtocolError(f"{name} message of {len(payload)} bytes")
+            message = decoder(body.unpack_from(payload, _header.size))
+        else:
+            message, end = decoder.read_fields(payload, _header.size)
+            if end != len(payload):
+                raise ProtocolError(f"{len(payload) - end} bytes after the end of a {name} message")
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ProtocolError(f"Truncated or corrupt message: {e}") from e
+    message['type'] = name
+    return message
@@ -0,0 +1,330 @@
+"""
+Match replays as input logs
+
+A replay file stores who fought where, then every frame's input bitmask for
+both players. Because the simulation core is deterministic, re-running those
+inputs through simulation.step() reproduces the match exactly, for a few KB
+per match instead of a video.
+
+Every KEYFRAME_INTERVAL frames the file also holds a keyframe (a
+MatchState.snapshot()), and an index of the keyframes is written at the end.
+A reader mmaps the file and reaches any frame by restoring the keyframe
+before it and simulating at most KEYFRAME_INTERVAL - 1 frames.
+
+File layout (all integers big-endian):
+    magic b'SFRP', version (B), header length (I), header (UTF-8 JSON)
+    records until the index:
+        b'K' + match snapshot     - state before the next recorded frame
+        b'R' + frames (H), p1 input (H), p2 input (H)   - a run of equal inputs
+    index: one (frame (I), file offset (Q)) entry per keyframe
+    trailer: index offset (Q), keyframe count (I), keyframe interval (I),
+             frame count (I), b'SFRI'
+
+Inputs are run-length encoded, since players tend to hold the same keys for
+many frames in a row; runs never cross a keyframe. A file without a trailer
+(say the game crashed mid-match) is still readable by scanning the records.
+
+Usage:
+    python replay.py <file> [frame]   - play a replay headless at full speed and print the result,
+                                        or jump to a frame and show the fighters there
+    python main.py --replay <file>    - watch it at 60 FPS (left/right arrows skip 5 seconds)
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+import simulation
+
+MAGIC = b'SFRP'
+INDEX_MAGIC = b'SFRI'
+VERSION = 2
+REPLAY_DIR = 'replays'
+KEYFRAME_INTERVAL = 300  # frames between keyframes (5 seconds at 60 FPS)
+
+_file_header = struct.Struct('!4sBI')
+_input_run = struct.Struct('!HHH')
+_index_entry = struct.Struct('!IQ')
+_trailer = struct.Struct('!QIII4s')
+KEYFRAME_TAG = b'K'
+RUN_TAG = b'R'
+KEYFRAME_RECORD_SIZE = 1 + simulation.MATCH_SNAPSHOT_SIZE
+RUN_RECORD_SIZE = 1 + _input_run.size
+MAX_RUN = 0xFFFF
+
+
+def match_header(match, names, background=None):
+    """Replay header for a match that is about to start"""
+    fighters = []
+    for name, fighter in zip(names, match.fighters):
+        fighters.append({
+            'name': name,
+            'frame_counts': list(fighter.frame_counts),
+            'special_skills': list(fighter.special_skills),
+            'x': fighter.x,
+            'y': fighter.y,
+            'flip': fighter.flip,
+        })
+    return {
+        'fighters': fighters,
+        'background': background,
+        'screen': [match.screen_width, match.screen_height],
+        'recorded': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def new_replay_path(directory=REPLAY_DIR):
+    """Timestamped file name in the replay folder (created if needed)"""
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, time.strftime('replay_%Y%m%d_%H%M%S.sfr'))
+
+
+class ReplayRecorder:
+    """Writes a replay file as the match is played
+
+    Create it before the first frame is simulated; match is used for the
+    keyframes (see record()).
+    """
+
+    def __init__(self, path, header, match, keyframe_interval=KEYFRAME_INTERVAL):
+        self.path = path
+        self.match = match
+        self.keyframe_interval = keyframe_interval
+        self.file = open(path, 'wb')
+        header_data = json.dumps(header).encode('utf-8')
+        self.file.write(_file_header.pack(MAGIC, VERSION, len(header_data)))
+        self.file.write(header_data)
+        self.run_inputs = None
+        self.run_length = 0
+        self.frames = 0
+        self.keyframes = []  # (frame, offset) index entries
+        self._write_keyframe(match.snapshot())
+        print(f"Recording replay to {path}")
+
+    def record(self, p1_input, p2_input, state=None):
+        """Add one frame of input
+
+        state is a snapshot of the match after this frame and is only read
+        when a keyframe is due; it defaults to the live match, so pass it when
+        recording frames the match has already moved past (rollback).
+        """
+        inputs = (p1_input, p2_input)
+        if inputs == self.run_inputs and self.run_length < MAX_RUN:
+            self.run_length += 1
+        else:
+            self._write_run()
+            self.run_inputs = inputs
+            self.run_length = 1
+        self.frames += 1
+
+        if self.frames % self.keyframe_interval == 0:
+            self._write_run()
+            self.run_inputs = None
+            self.run_length = 0
+            self._write_keyframe(self.match.snapshot() if state is None else state)
+
+    def _write_run(self):
+        if self.run_length:
+            self.file.write(RUN_TAG + _input_run.pack(self.run_length, *self.run_inputs))
+
+    def _write_keyframe(self, state):
+        self.keyframes.append((self.frames, self.file.tell()))
+        self.file.write(KEYFRAME_TAG)
+        self.file.write(state)
+
+    def close(self):
+        """Finish the last run and write the keyframe index"""
+        if not self.file:
+            return
+        self._write_run()
+        index_offset = self.file.tell()
+        for frame, offset in self.keyframes:
+            self.file.write(_index_entry.pack(frame, offset))
+        self.file.write(_trailer.pack(index_offset, len(self.keyframes), self.keyframe_interval,
+                                      self.frames, INDEX_MAGIC))
+        self.file.close()
+        self.file = None
+        print(f"Saved replay {self.path} ({self.frames} frames)")
+
+
+class Replay:
+    """A replay file opened through mmap; seek() reaches any frame quickly"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            try:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise ValueError(f"{path} is not a replay file")
+        if len(self.data) < _file_header.size:
+            raise ValueError(f"{path} is not a replay file")
+        magic, version, header_length = _file_header.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a replay file")
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay version {version}")
+        self.body_offset = _file_header.size + header_length
+        self.header = json.loads(self.data[_file_header.size:self.body_offset].decode('utf-8'))
+        self._inputs = None
+
+        if not self._read_index():
+            self._scan_records()
+
+    def _read_index(self):
+        """Use the trailer and index; False if the file has none"""
+        if len(self.data) < self.body_offset + _trailer.size:
+            return False
+        (index_offset, keyframe_count, self.keyframe_interval,
+         self.frame_count, magic) = _trailer.unpack_from(self.data, len(self.data) - _trailer.size)
+        if magic != INDEX_MAGIC:
+            return False
+        self.index_offset = index_offset
+        self.keyframe_count = keyframe_count
+        self.body_end = index_offset
+        return True
+
+    def _scan_records(self):
+        """Rebuild the index of an unfinished recording by walking its records"""
+        keyframes = []
+        frame = 0
+        offset = self.body_offset
+        end = len(self.data)
+        while offset < end:
+            tag = self.data[offset:offset + 1]
+            if tag == KEYFRAME_TAG and offset + KEYFRAME_RECORD_SIZE <= end:
+                keyframes.append((frame, offset))
+                offset += KEYFRAME_RECORD_SIZE
+            elif tag == RUN_TAG and offset + RUN_RECORD_SIZE <= end:
+                frame += _input_run.unpack_from(self.data, offset + 1)[0]
+                offset += RUN_RECORD_SIZE
+            else:
+                break  # torn final record
+        self.body_end = offset
+        self.frame_count = frame
+        self.keyframe_interval = keyframes[1][0] if len(keyframes) > 1 else KEYFRAME_INTERVAL
+        self.keyframe_count = len(keyframes)
+        # Keep the rebuilt index in memory in the same layout as the file's
+        self.index = b''.join(_index_entry.pack(frame, offset) for frame, offset in keyframes)
+        self.index_offset = None
+
+    def keyframe(self, number):
+        """(frame, file offset) of a keyframe, read straight from the index"""
+        if self.index_offset is None:
+            return _index_entry.unpack_from(self.index, number * _index_entry.size)
+        return _index_entry.unpack_from(self.data, self.index_offset + number * _index_entry.size)
+
+    @property
+    def names(self):
+        return [fighter['name'] for fighter in self.header['fighters']]
+
+    @property
+    def inputs(self):
+        """(p1, p2) input pair of every frame, decoded on first use"""
+        if self._inputs is None:
+            self._inputs = []
+            for run_length, p1_input, p2_input in self._runs(self.body_offset):
+                self._inputs.extend([(p1_input, p2_input)] * run_length)
+        return self._inputs
+
+    def _runs(self, offset):
+        """Input runs from a record offset to the end of the body"""
+        data = self.data
+        while offset < self.body_end:
+            tag = data[offset:offset + 1]
+            if tag == KEYFRAME_TAG:
+                offset += KEYFRAME_RECORD_SIZE
+            elif tag == RUN_TAG and offset + RUN_RECORD_SIZE <= self.body_end:
+                yield _input_run.unpack_from(data, offset + 1)
+                offset += RUN_RECORD_SIZE
+            else:
+                return
+
+    def new_match(self):
+        """Fresh MatchState set up as the recorded match started"""
+        fighters = [simulation.FighterState(player, f['x'], f['y'], f['flip'],
+                                            f['frame_counts'], f['special_skills'])
+                    for player, f in enumerate(self.header['fighters'], 1)]
+        width, height = self.header['screen']
+        return simulation.MatchState(fighters[0], fighters[1], width, height)
+
+    def seek(self, match, frame):
+        """Put match (from new_match()) at the start of a frame, in place"""
+        frame = max(0, min(frame, self.frame_count))
+        if self.keyframe_count == 0:
+            return self._play(match, self.body_offset, 0, frame)
+        number = min(frame // self.keyframe_interval, self.keyframe_count - 1)
+        keyframe_frame, offset = self.keyframe(number)
+        match.restore(self.data, offset + 1)
+        return self._play(match, offset, keyframe_frame, frame)
+
+    def _play(self, match, offset, start_frame, frame):
+        """Simulate from a record offset (at start_frame) up to frame"""
+        current = start_frame
+        for run_length, p1_input, p2_input in self._runs(offset):
+            if current >= frame:
+                break
+            for _ in range(min(run_length, frame - current)):
+                simulation.step(match, p1_input, p2_input)
+            current += run_length
+        return match
+
+    def close(self):
+        self.data.close()
+
+
+def load_replay(path):
+    """Open a replay file; raises ValueError if it is not one"""
+    return Replay(path)
+
+
+def play_headless(replay):
+    """Re-run a whole replay from frame 0 through the simulation core as fast as possible"""
+    return replay._play(replay.new_match(), replay.body_offset, 0, replay.frame_count)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python replay.py <replay file> [frame]")
+        sys.exit(1)
+
+    try:
+        replay = load_replay(sys.argv[1])
+    except (OSError, ValueError) as e:
+        print(f"Could not load replay: {e}")
+        sys.exit(1)
+
+    name1, name2 = replay.names
+    print(f"{name1} vs {name2}, {replay.frame_count} frames "
+          f"({replay.frame_count / 60:.1f}s at 60 FPS), {replay.keyframe_count} keyframes, "
+          f"recorded {replay.header.get('recorded', '?')}")
+
+    if len(sys.argv) > 2:
+        frame = int(sys.argv[2])
+        start = time.perf_counter()
+        match = replay.seek(replay.new_match(), frame)
+        elapsed = time.perf_counter() - start
+        print(f"Frame {match.frame} reached in {elapsed * 1000:.2f}ms")
+        for name, fighter in zip(replay.names, match.fighters):
+            print(f"  {name}: x={fighter.x} y={fighter.y} health={fighter.health} action={fighter.action}")
+        return
+
+    start = time.perf_counter()
+    match = play_headless(replay)
+    elapsed = time.perf_counter() - start
+
+    winner = match.winner()
+    if winner is None:
+        result = "no winner yet"
+    elif winner == 0:
+        result = "draw"
+    else:
+        result = f"{replay.names[winner - 1]} wins"
+    fighter1, fighter2 = match.fighters
+    print(f"Result: {result} (health {fighter1.health} - {fighter2.health})")
+    print(f"Simulated in {elapsed:.3f}s ({replay.frame_count / max(elapsed, 1e-9):,.0f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
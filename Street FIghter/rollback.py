@@ -0,0 +1,130 @@
+"""
+Rollback netcode for network matches
+
+Predict-then-correct model in the style of GGPO. The local input is applied
+straight away and the remote input is predicted by repeating the last one
+received. The match is snapshotted before every frame; when a remote input
+arrives that differs from what was predicted, the session restores the
+snapshot of that frame and re-simulates up to the present before the next
+frame is drawn.
+"""
+import controls
+import simulation
+
+MAX_ROLLBACK_FRAMES = 8  # how far we may run ahead of the last confirmed remote input
+
+
+class RollbackSession:
+    """Steps a MatchState for one local and one remote player"""
+
+    def __init__(self, match, local_player, max_rollback=MAX_ROLLBACK_FRAMES):
+        self.match = match
+        self.local_player = local_player  # index into match.fighters (0 or 1)
+        self.remote_player = 1 - local_player
+        self.max_rollback = max_rollback
+        self.local_inputs = {}  # frame: input mask
+        self.remote_inputs = {}  # frame: input mask received from the peer
+        self.predicted_inputs = {}  # frame: remote mask simulated before the real one arrived
+        # Ring of preallocated snapshot buffers indexed by frame; a rollback
+        # never reaches back more than max_rollback + 1 frames
+        self.snapshots = [bytearray(match.snapshot_size) for _ in range(max_rollback + 2)]
+        self.confirmed_frame = -1  # remote inputs are known for every frame up to here
+        self.rollback_frame = None  # earliest mispredicted frame, corrected on next advance()
+        self.rollbacks = 0
+        self.resimulated_frames = 0
+        self.recorder = None  # optional replay.ReplayRecorder, fed confirmed frames only
+        self.recorded_frame = -1
+
+    @property
+    def frame(self):
+        """Next frame to be simulated"""
+        return self.match.frame
+
+    def add_remote_input(self, frame, input_mask):
+        """Record the peer's input for a frame"""
+        if frame in self.remote_inputs or frame <= self.confirmed_frame:
+            return
+        self.remote_inputs[frame] = input_mask
+        while self.confirmed_frame + 1 in self.remote_inputs:
+            self.confirmed_frame += 1
+
+        predicted = self.predicted_inputs.pop(frame, None)
+        if predicted is not None and predicted != input_mask:
+            if self.rollback_frame is None or frame < self.rollback_frame:
+                self.rollback_frame = frame
+
+    def predict_remote_input(self, frame):
+        """Remote input for a frame: the real one if we have it, else the last one seen"""
+        if frame in self.remote_inputs:
+            return self.remote_inputs[frame]
+        return self.remote_inputs.get(self.confirmed_frame, controls.NO_INPUT)
+
+    def can_advance(self):
+        """False once we are max_rollback frames ahead of the peer"""
+        return self.frame - self.confirmed_frame <= self.max_rollback
+
+    def advance(self, local_input):
+        """Correct any misprediction, then simulate the next frame
+
+        Returns False (and simulates nothing) while waiting for the peer to
+        catch up; the caller should send local_input only when this is True.
+        """
+        self.rollback()
+        if not self.can_advance():
+            return False
+        self.local_inputs[self.frame] = local_input
+        self.simulate_frame()
+        self.discard_confirmed()
+        return True
+
+    def rollback(self):
+        """Restore the first mispredicted frame and re-simulate up to the present"""
+        if self.rollback_frame is None:
+            return
+        current_frame = self.frame
+        self.match.restore(self.snapshot_buffer(self.rollback_frame))
+        self.rollback_frame = None
+        self.rollbacks += 1
+        while self.frame < current_frame:
+            self.simulate_frame()
+            self.resimulated_frames += 1
+
+    def simulate_frame(self):
+        frame = self.frame
+        self.match.snapshot_into(self.snapshot_buffer(frame))
+        remote_input = self.predict_remote_input(frame)
+        if frame not in self.remote_inputs:
+            self.predicted_inputs[frame] = remote_input
+
+        inputs = [None, None]
+        inputs[self.local_player] = self.local_inputs[frame]
+        inputs[self.remote_player] = remote_input
+        simulation.step(self.match, inputs[0], inputs[1])
+
+    def snapshot_buffer(self, frame):
+        """Buffer holding the match as it was before a frame was simulated"""
+        return self.snapshots[frame % len(self.snapshots)]
+
+    def record_confirmed(self):
+        """Pass frames whose inputs are final (simulated and confirmed) to the recorder"""
+        last_frame = min(self.confirmed_frame, self.frame - 1)
+        for frame in range(self.recorded_frame + 1, last_frame + 1):
+            inputs = [None, None]
+            inputs[self.local_player] = self.local_inputs[frame]
+            inputs[self.remote_player] = self.remote_inputs[frame]
+            # State after this frame, for the recorder's keyframes
+            state = self.snapshot_buffer(frame + 1) if frame + 1 < self.frame else None
+            self.recorder.record(inputs[0], inputs[1], state)
+        self.recorded_frame = max(self.recorded_frame, last_frame)
+
+    def discard_confirmed(self):
+        """Drop history that no rollback can reach any more"""
+        if self.recorder:
+            self.record_confirmed()
+        # Simulated frames up to confirmed_frame can never be mispredicted
+        # again. Inputs from a peer that is ahead of us are kept until we
+        # simulate them, and the confirmed_frame input is kept for prediction
+        oldest_needed = min(self.confirmed_frame, self.frame)
+        for history in (self.local_inputs, self.remote_inputs):
+            for frame in [f for f in history if f < oldest_needed]:
+                del history[frame]
@@ -1,13 +1,30 @@
 import pygame
 import socket
 import threading
-import pickle
 import sys
 import time
 import os
 import random
 from fighter import Fighter
+import simulation
+import controls
+from framing import MessageReader, send_message
+import replay
 from character_select import CharacterSelect
+from asset_manager import asset_manager
+from image_cache import load_image
+from image_info import folder_index
+from asset_prefetch import prefetcher
+from sprite_loader import sprite_loader
+
+# Fighter sprite layout of the test game sheets used for room fights
+WARRIOR_SIZE = 162
+WARRIOR_SCALE = 4
+WARRIOR_OFFSET = [72, 56]
+ANIMATION_STEPS = [10, 8, 1, 7, 7, 3, 7]
+P1_PLACEHOLDER_COLOR = (100, 100, 255)
+P2_PLACEHOLDER_COLOR = (255, 100, 100)
+BACKGROUND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images", "background")
 
 class RoomBrowser:
     def __init__(self, screen_width, screen_height):
@@ -33,8 +50,7 @@ class RoomBrowser:
                 print(f"RoomBrowser: File exists: {os.path.exists(bg_path)}")
                 
                 if os.path.exists(bg_path):
-                    self.background_image = pygame.image.load(bg_path)
-                    self.background_image = pygame.transform.scale(self.background_image, (self.screen_width, self.screen_height))
+                    self.background_image = asset_manager.image(bg_path, (self.screen_width, self.screen_height))
                     print(f"RoomBrowser: Successfully loaded background: {bg_path}")
                 else:
                     print(f"RoomBrowser: File does not exist: {bg_path}")
@@ -181,7 +197,7 @@ class RoomBrowser:
         return None
 
 class RoomClient:
-    def __init__(self, server_host='localhost', server_port=12345):
+    def __init__(self, server_host='localhost', server_port=12345, record_replays=False):
         pygame.init()
         self.screen_width = 1000
         self.screen_height = 600
@@ -209,6 +225,7 @@ class RoomClient:
             print(f"Error initializing character selection: {e}")
             # Create a minimal character select if there's an error
             self.character_select = CharacterSelect(self.screen_width, self.screen_height)
+        self.character_select.prefetch_character = self.prefetch_selected_character
         
         # Game state
         self.state = 'connecting'  # connecting, menu, room_browser, in_room, character_select, playing, local_fight
@@ -220,7 +237,12 @@ class RoomClient:
         self.input_active = False
         self.both_players_ready = False
         self.fighters = []
+        self.match = None
         self.background = None
+        self.record_replays = record_replays
+        self.recorder = None
+        self.pending_background = None  # stage preloading during the ready countdown
+        self.pending_game_start = None  # game_start from the server, set up by update()
         
         # Local fighting variables
         self.local_fight_background = None
@@ -251,11 +273,11 @@ class RoomClient:
             print(f"Loading backgrounds from: {bg_path}")
             
             if os.path.exists(bg_path):
-                bg_image = pygame.image.load(bg_path)
-                # Scale once and reuse for all screens
-                self.menu_background = pygame.transform.scale(bg_image.copy(), (self.screen_width, self.screen_height))
-                self.connecting_background = pygame.transform.scale(bg_image.copy(), (self.screen_width, self.screen_height))
-                self.dialog_background = pygame.transform.scale(bg_image.copy(), (self.screen_width, self.screen_height))
+                # One shared surface; the screens only ever blit it
+                bg_image = asset_manager.image(bg_path, (self.screen_width, self.screen_height))
+                self.menu_background = bg_image
+                self.connecting_background = bg_image
+                self.dialog_background = bg_image
                 print(f"Successfully loaded Home.jpg background")
             else:
                 print(f"Home.jpg not found, using fallback backgrounds")
@@ -299,15 +321,16 @@ class RoomClient:
             return True  # Return True anyway to allow testing without server
     
     def receive_messages(self):
+        reader = MessageReader()
         while self.running and self.connected:
             try:
-                data = self.socket.recv(4096)
-                if not data:
+                messages = reader.receive(self.socket)
+                if messages is None:
                     self.connected = False
                     break
                     
-                message = pickle.loads(data)
-                self.handle_server_message(message)
+                for message in messages:
+                    self.handle_server_message(message)
                 
             except Exception as e:
                 if self.running:
@@ -381,13 +404,12 @@ class RoomClient:
             })
             
         elif msg_type == 'game_start':
-            # Transition to playing state with synchronized background
-            self.setup_game(message)
-            self.state = 'playing'
+            # Set up on the main thread by update(), which also ends the ready countdown
+            self.pending_game_start = message
             
         elif msg_type == 'opponent_input':
             if hasattr(self, 'opponent_input'):
-                self.opponent_input = message['input']
+                self.opponent_input = controls.unpack(message['input'])
             
         elif msg_type == 'error':
             print(f"Server error: {message['message']}")
@@ -400,8 +422,7 @@ class RoomClient:
     def send_message(self, message):
         if self.connected:
             try:
-                serialized_data = pickle.dumps(message)
-                self.socket.send(serialized_data)
+                send_message(self.socket, message)
             except Exception as e:
                 print(f"Failed to send message: {e}")
     
@@ -546,6 +567,10 @@ class RoomClient:
                             if self.character_select.opponent_selection:
                                 self.character_select.set_both_players_ready(True)
                                 self.send_message({'type': 'player_ready', 'ready': True})
+            
+            elif event.type == pygame.MOUSEMOTION:
+                if self.state == 'character_select':
+                    self.character_select.handle_mouse_motion(event.pos)
     
     def handle_text_input(self, event):
         if event.key == pygame.K_RETURN:
@@ -634,13 +659,15 @@ class RoomClient:
         # Get selected characters and background
         char1 = self.character_select.selected_chars[0]
         char2 = self.character_select.selected_chars[1]
-        background = self.character_select.get_random_background()
+        background = self.character_select.get_selected_background()
         
         # Load the background for fighting
         self.load_fight_background(background)
         
         # Create fighters with character data
         self.create_local_fighters(char1, char2)
+        if self.record_replays:
+            self.start_recording([char1['name'], char2['name']], background.get('name'))
         
         # Switch to fighting state
         self.state = 'local_fight'
@@ -648,16 +675,13 @@ class RoomClient:
         self.round_over_time = 0
         
         print(f"Fight: {char1['name']} vs {char2['name']} on {background['name']}")
+        print(asset_manager.report())
 
     def load_fight_background(self, background):
         """Load the background for fighting"""
         try:
             if background.get('path') and os.path.exists(background['path']):
-                self.local_fight_background = pygame.image.load(background['path'])
-                self.local_fight_background = pygame.transform.scale(
-                    self.local_fight_background, 
-                    (self.screen_width, self.screen_height)
-                )
+                self.local_fight_background = prefetcher.image(background['path'], (self.screen_width, self.screen_height))
                 print(f"Loaded fight background: {background['name']}")
             else:
                 # Use fallback background
@@ -669,18 +693,13 @@ class RoomClient:
 
     def create_local_fighters(self, char1, char2):
         """Create fighter objects for local play using exact test game approach"""
-        # Exact fighter data from test game
-        WARRIOR_SIZE = 162
-        WARRIOR_SCALE = 4
-        WARRIOR_OFFSET = [72, 56]
+        # Exact fighter data and animation steps from test game
         fighter_data = [WARRIOR_SIZE, WARRIOR_SCALE, WARRIOR_OFFSET]
-        
-        # Exact animation steps from test game
-        animation_steps = [10, 8, 1, 7, 7, 3, 7]
+        animation_steps = ANIMATION_STEPS
         
         # Try to load actual character sprites first
-        sprite_sheet1 = self.load_character_sprite_sheet(char1['name']) or self.create_placeholder_sprite_sheet((100, 100, 255), animation_steps, fighter_data[0])
-        sprite_sheet2 = self.load_character_sprite_sheet(char2['name']) or self.create_placeholder_sprite_sheet((255, 100, 100), animation_steps, fighter_data[0])
+        sprite_sheet1 = self.fighter_sprite_sheet(char1['name'], P1_PLACEHOLDER_COLOR)
+        sprite_sheet2 = self.fighter_sprite_sheet(char2['name'], P2_PLACEHOLDER_COLOR)
         
         # Position fighters exactly like in test game
         fighter1 = Fighter(1, 200, 310, False, fighter_data, sprite_sheet1,
@@ -689,29 +708,56 @@ class RoomClient:
                           animation_steps, None, char2.get('special_skills', []))
         
         self.fighters = [fighter1, fighter2]
+        self.match = simulation.MatchState(fighter1.state, fighter2.state, self.screen_width, self.screen_height)
         print(f"Created local fighters: {char1['name']} vs {char2['name']}")
         print(f"Fighter 1 position: ({fighter1.rect.x}, {fighter1.rect.y})")
         print(f"Fighter 2 position: ({fighter2.rect.x}, {fighter2.rect.y})")
         print(f"Using fighter data: {fighter_data}")
         print(f"Using animation steps: {animation_steps}")
 
+    def start_recording(self, names, background):
+        """Record the match that is starting to a new replay file"""
+        self.stop_recording()
+        try:
+            header = replay.match_header(self.match, names, background)
+            self.recorder = replay.ReplayRecorder(replay.new_replay_path(), header, self.match)
+        except OSError as e:
+            print(f"Could not start replay recording: {e}")
+
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
     def cleanup_local_fight(self):
         """Clean up local fight resources"""
+        self.stop_recording()
         self.fighters = []
+        self.match = None
         self.local_fight_background = None
         self.round_over = False
         self.round_over_time = 0
         self.character_select.reset_selection()
 
     def update(self):
-        # Check for automatic game start in character selection (network mode)
-        if (self.state == 'character_select' and 
+        # The server's game_start starts both players together, with its stage
+        if self.pending_game_start is not None:
+            game_data, self.pending_game_start = self.pending_game_start, None
+            self.setup_game(game_data)
+            self.state = 'playing'
+            self.pending_background = None
+            if hasattr(self, 'ready_time'):
+                delattr(self, 'ready_time')
+
+        # Without it (e.g. an older server), start from a local countdown
+        if (self.state == 'character_select' and
             self.character_select.network_mode and 
             self.character_select.both_players_ready):
             # Wait a moment before transitioning to show both selections 
             if not hasattr(self, 'ready_time'):
                 self.ready_time = time.time()
                 print("Both players ready! Starting game in 2 seconds...")
+                self.prefetch_fight_assets()
             elif time.time() - self.ready_time > 2:  # Wait 2 seconds
                 # Both players ready, transition to game
                 print("Transitioning to game state...")
@@ -722,6 +768,9 @@ class RoomClient:
                         'guest': {'character': self.character_select.opponent_selection or self.character_select.selected_chars[0]}
                     }
                 }
+                if self.pending_background:
+                    mock_game_data['background'] = self.pending_background
+                    self.pending_background = None
                 self.setup_game(mock_game_data)
                 self.state = 'playing'
                 # Reset the ready time for next use
@@ -734,13 +783,13 @@ class RoomClient:
             opponent_fighter = self.fighters[1] if self.role == 'host' else self.fighters[0]
             
             local_input = local_fighter.get_input_state()
-            opponent_input = getattr(self, 'opponent_input', {})
+            opponent_input = getattr(self, 'opponent_input', controls.NO_INPUT)
             
             # Send input to server
             if self.connected:
                 self.send_message({
                     'type': 'game_input',
-                    'input': local_input,
+                    'input': controls.pack(local_input),
                     'game_state': {
                         'rect': [local_fighter.rect.x, local_fighter.rect.y],
                         'health': local_fighter.health,
@@ -750,26 +799,31 @@ class RoomClient:
                     }
                 })
             
-            # Update fighters
-            local_fighter.move(self.screen_width, self.screen_height, self.screen,
-                             opponent_fighter, False, local_input)
-            opponent_fighter.move(self.screen_width, self.screen_height, self.screen,
-                                local_fighter, False, opponent_input)
+            # Step the simulation with both players' inputs
+            if self.role == 'host':
+                p1_input, p2_input = local_input, opponent_input
+            else:
+                p1_input, p2_input = opponent_input, local_input
+            simulation.step(self.match, p1_input, p2_input)
+            if self.recorder:
+                self.recorder.record(p1_input, p2_input)
             
-            # Update animations
+            # Refresh animation frames
             for fighter in self.fighters:
                 fighter.update()
                 
         elif self.state == 'local_fight' and self.fighters:
             # Local fight logic
             if not self.round_over:
-                # Update both fighters
-                self.fighters[0].move(self.screen_width, self.screen_height, self.screen,
-                                    self.fighters[1], self.round_over)
-                self.fighters[1].move(self.screen_width, self.screen_height, self.screen,
-                                    self.fighters[0], self.round_over)
+                # Step both fighters
+                self.match.round_over = self.round_over
+                p1_input = self.fighters[0].get_input_state()
+                p2_input = self.fighters[1].get_input_state()
+                simulation.step(self.match, p1_input, p2_input)
+                if self.recorder:
+                    self.recorder.record(p1_input, p2_input)
                 
-                # Update animations
+                # Refresh animation frames
                 for fighter in self.fighters:
                     fighter.update()
                 
@@ -788,21 +842,16 @@ class RoomClient:
     def setup_game(self, game_data):
         players = game_data['players']
         
-        # Use exact fighter data from test game
-        WARRIOR_SIZE = 162
-        WARRIOR_SCALE = 4
-        WARRIOR_OFFSET = [72, 56]
+        # Use exact fighter data and animation steps from test game
         fighter_data = [WARRIOR_SIZE, WARRIOR_SCALE, WARRIOR_OFFSET]
-        
-        # Use exact animation steps from test game  
-        animation_steps = [10, 8, 1, 7, 7, 3, 7]  # Test game animation steps
+        animation_steps = ANIMATION_STEPS
         
         host_char = players['host']['character']
         guest_char = players['guest']['character']
         
         # Try to load actual character sprites, fallback to placeholders
-        sprite_sheet1 = self.load_character_sprite_sheet(host_char['name']) or self.create_placeholder_sprite_sheet((100, 100, 255), animation_steps, fighter_data[0])
-        sprite_sheet2 = self.load_character_sprite_sheet(guest_char['name']) or self.create_placeholder_sprite_sheet((255, 100, 100), animation_steps, fighter_data[0])
+        sprite_sheet1 = self.fighter_sprite_sheet(host_char['name'], P1_PLACEHOLDER_COLOR)
+        sprite_sheet2 = self.fighter_sprite_sheet(guest_char['name'], P2_PLACEHOLDER_COLOR)
         attack_sound = None
         
         # Position fighters like in the test game
@@ -812,7 +861,10 @@ class RoomClient:
                           animation_steps, attack_sound, guest_char.get('special_skills', []))
         
         self.fighters = [fighter1, fighter2]
-        self.opponent_input = {}
+        self.match = simulation.MatchState(fighter1.state, fighter2.state, self.screen_width, self.screen_height)
+        self.opponent_input = controls.NO_INPUT
+        if self.record_replays:
+            self.start_recording([host_char['name'], guest_char['name']], game_data.get('background'))
         
         # Load synchronized background from server
         if 'background' in game_data:
@@ -826,9 +878,70 @@ class RoomClient:
         print(f"Fighter 2 position: ({fighter2.rect.x}, {fighter2.rect.y})")
         print(f"Using fighter data: {fighter_data}")
         print(f"Using animation steps: {animation_steps}")
+        print(asset_manager.report())
     
     def load_character_sprite_sheet(self, character_name):
         """Load actual character sprite sheet exactly like the test game"""
+        return asset_manager.get(('room sheet', character_name), self._load_checked_sprite_sheet, character_name)
+    
+    def _load_checked_sprite_sheet(self, character_name):
+        sprite_sheet = self._load_character_sprite_sheet(character_name)
+        needed = (max(ANIMATION_STEPS) * WARRIOR_SIZE, len(ANIMATION_STEPS) * WARRIOR_SIZE)
+        if sprite_sheet and (sprite_sheet.get_width() < needed[0] or sprite_sheet.get_height() < needed[1]):
+            print(f"Sprite sheet for {character_name} is {sprite_sheet.get_size()}, "
+                  f"smaller than the {needed} layout; using placeholder")
+            sprite_sheet = None
+        return sprite_sheet
+    
+    def fighter_sprite_sheet(self, character_name, base_color):
+        """Sheet for a fighter, or the placeholder of its side, with its frames already cut"""
+        return prefetcher.result(('fighter sheet', character_name, base_color),
+                                 self._prepare_fighter_sprite_sheet, character_name, base_color)
+    
+    def prefetch_fighter_sheet(self, character_name, base_color):
+        """Start preparing fighter_sprite_sheet() on the prefetch threads"""
+        prefetcher.submit(('fighter sheet', character_name, base_color),
+                          self._prepare_fighter_sprite_sheet, character_name, base_color)
+    
+    def _prepare_fighter_sprite_sheet(self, character_name, base_color):
+        sprite_sheet = self.load_character_sprite_sheet(character_name)
+        if sprite_sheet is None:
+            sprite_sheet = asset_manager.get(('placeholder sheet', base_color), self.create_placeholder_sprite_sheet,
+                                             base_color, ANIMATION_STEPS, WARRIOR_SIZE)
+        # Cut and scale the frames now so creating the Fighter has nothing left to do
+        sprite_loader.get_animation_set(sprite_sheet, WARRIOR_SIZE, WARRIOR_SCALE, ANIMATION_STEPS)
+        return sprite_sheet
+    
+    def prefetch_selected_character(self, character_name):
+        """CharacterSelect hook: preload a hovered or picked character for the side choosing"""
+        if self.character_select.network_mode:
+            first_side = self.role == 'host'
+        else:
+            first_side = self.character_select.current_player == 0
+        self.prefetch_fighter_sheet(character_name, P1_PLACEHOLDER_COLOR if first_side else P2_PLACEHOLDER_COLOR)
+    
+    def prefetch_fight_assets(self):
+        """Preload both fighters and pick and preload the stage during the ready countdown"""
+        host_char = self.character_select.selected_chars[0]
+        guest_char = self.character_select.opponent_selection or host_char
+        self.prefetch_fighter_sheet(host_char['name'], P1_PLACEHOLDER_COLOR)
+        self.prefetch_fighter_sheet(guest_char['name'], P2_PLACEHOLDER_COLOR)
+        self.pending_background = self.random_background_file()
+        if self.pending_background:
+            prefetcher.prefetch_image(self.background_path(self.pending_background),
+                                      (self.screen_width, self.screen_height))
+    
+    def background_path(self, background_filename):
+        return os.path.join(BACKGROUND_DIR, background_filename)
+    
+    def random_background_file(self):
+        """File name of a random stage in images/background, or None"""
+        if not os.path.exists(BACKGROUND_DIR):
+            return None
+        bg_files = [f for f in os.listdir(BACKGROUND_DIR) if f.endswith(('.png', '.jpg', '.jpeg'))]
+        return random.choice(bg_files) if bg_files else None
+    
+    def _load_character_sprite_sheet(self, character_name):
         try:
             script_dir = os.path.dirname(os.path.abspath(__file__))
             
@@ -837,7 +950,7 @@ class RoomClient:
             print(f"Attempting to load sprite sheet: {sprite_path}")
             
             if os.path.exists(sprite_path):
-                sprite_sheet = pygame.image.load(sprite_path).convert_alpha()
+                sprite_sheet = load_image(sprite_path, alpha=True)
                 print(f"Successfully loaded sprite sheet for {character_name}: {sprite_sheet.get_size()}")
                 return sprite_sheet
             
@@ -850,35 +963,21 @@ class RoomClient:
                 if sprite_files:
                     # Use the first PNG file found
                     sprite_path = os.path.join(sprites_folder, sprite_files[0])
-                    sprite_sheet = pygame.image.load(sprite_path).convert_alpha()
+                    sprite_sheet = load_image(sprite_path, alpha=True)
                     print(f"Loaded sprite sheet for {character_name}: {sprite_files[0]} (size: {sprite_sheet.get_size()})")
                     return sprite_sheet
             
             # If no Sprites folder, try the main character folder
             char_folder = os.path.join(script_dir, "images", character_name)
             if os.path.exists(char_folder):
-                png_files = [f for f in os.listdir(char_folder) if f.endswith('.png')]
+                png_files = {f: info for f, info in folder_index(char_folder).items() if info[2] == 'png'}
                 if png_files:
-                    # Try to find a file that looks like a sprite sheet (larger file)
-                    largest_file = None
-                    largest_size = 0
-                    
-                    for png_file in png_files:
-                        file_path = os.path.join(char_folder, png_file)
-                        try:
-                            img = pygame.image.load(file_path)
-                            size = img.get_width() * img.get_height()
-                            if size > largest_size:
-                                largest_size = size
-                                largest_file = png_file
-                        except:
-                            continue
-                    
-                    if largest_file:
-                        sprite_path = os.path.join(char_folder, largest_file)
-                        sprite_sheet = pygame.image.load(sprite_path).convert_alpha()
-                        print(f"Loaded largest sprite file for {character_name}: {largest_file} (size: {sprite_sheet.get_size()})")
-                        return sprite_sheet
+                    # The largest image is most likely the sprite sheet; sizes come from the file headers
+                    largest_file = max(png_files, key=lambda f: png_files[f][0] * png_files[f][1])
+                    sprite_path = os.path.join(char_folder, largest_file)
+                    sprite_sheet = load_image(sprite_path, alpha=True)
+                    print(f"Loaded largest sprite file for {character_name}: {largest_file} (size: {sprite_sheet.get_size()})")
+                    return sprite_sheet
                         
         except Exception as e:
             print(f"Error loading sprite sheet for {character_name}: {e}")
@@ -927,7 +1026,7 @@ class RoomClient:
                 if filename in available_files:
                     sprite_path = os.path.join(char_folder, filename)
                     try:
-                        sprite_img = pygame.image.load(sprite_path)
+                        sprite_img = load_image(sprite_path, alpha=True)
                         print(f"Loaded {filename} for animation row {anim_row}")
                         
                         # Resize to expected size if needed
@@ -979,7 +1078,7 @@ class RoomClient:
             
             # Use the first available image for all animations
             first_image_path = os.path.join(char_folder, available_files[0])
-            base_sprite = pygame.image.load(first_image_path)
+            base_sprite = load_image(first_image_path, alpha=True)
             
             # Handle different source image sizes
             if base_sprite.get_width() > sprite_size * 2 or base_sprite.get_height() > sprite_size * 2:
@@ -1005,12 +1104,10 @@ class RoomClient:
     def load_synchronized_background(self, background_filename):
         """Load the synchronized background specified by the server"""
         try:
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            bg_path = os.path.join(script_dir, "images", "background", background_filename)
+            bg_path = self.background_path(background_filename)
             
             if os.path.exists(bg_path):
-                self.background = pygame.image.load(bg_path)
-                self.background = pygame.transform.scale(self.background, (self.screen_width, self.screen_height))
+                self.background = prefetcher.image(bg_path, (self.screen_width, self.screen_height))
                 print(f"Loaded synchronized background: {background_filename}")
                 return
                 
@@ -1107,22 +1204,11 @@ class RoomClient:
         """Load a random background from the available backgrounds for network play"""
         
         try:
-            # Get the directory of the current script
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            bg_folder = os.path.join(script_dir, "images", "background")
-            
-            if os.path.exists(bg_folder):
-                # Get all background files
-                bg_files = [f for f in os.listdir(bg_folder) if f.endswith(('.png', '.jpg', '.jpeg'))]
-                if bg_files:
-                    # Select a random background
-                    selected_bg = random.choice(bg_files)
-                    bg_path = os.path.join(bg_folder, selected_bg)
-                    
-                    self.background = pygame.image.load(bg_path)
-                    self.background = pygame.transform.scale(self.background, (self.screen_width, self.screen_height))
-                    print(f"Network game: Loaded random background: {selected_bg}")
-                    return
+            selected_bg = self.random_background_file()
+            if selected_bg:
+                self.background = asset_manager.image(self.background_path(selected_bg), (self.screen_width, self.screen_height))
+                print(f"Network game: Loaded random background: {selected_bg}")
+                return
                     
         except Exception as e:
             print(f"Error loading random background: {e}")
@@ -1139,8 +1225,7 @@ class RoomClient:
             bg_path = os.path.join(script_dir, "images", "background", "Home.jpg")
             print(f"Game: Trying to load: {bg_path}")
             if os.path.exists(bg_path):
-                self.background = pygame.image.load(bg_path)
-                self.background = pygame.transform.scale(self.background, (self.screen_width, self.screen_height))
+                self.background = asset_manager.image(bg_path, (self.screen_width, self.screen_height))
                 print(f"Game: Successfully loaded background: {bg_path}")
                 return
             else:
@@ -1537,6 +1622,8 @@ class RoomClient:
         self.screen.blit(inst_surface, inst_rect)
 
     def close(self):
+        self.stop_recording()
+        prefetcher.shutdown()
         self.running = False
         self.connected = False
         if self.socket:
@@ -1585,10 +1672,12 @@ if __name__ == "__main__":
     server_host = 'localhost'
     server_port = 12345
     
-    if len(sys.argv) > 1:
-        server_host = sys.argv[1]
-    if len(sys.argv) > 2:
-        server_port = int(sys.argv[2])
+    # python room_client.py [host] [port] [--record]
+    args = [arg for arg in sys.argv[1:] if arg != '--record']
+    if len(args) > 0:
+        server_host = args[0]
+    if len(args) > 1:
+        server_port = int(args[1])
     
-    client = RoomClient(server_host, server_port)
+    client = RoomClient(server_host, server_port, record_replays='--record' in sys.argv)
     client.run()
@@ -1,9 +1,28 @@
-import socket
-import threading
-import pickle
+"""
+Room server for online play
+
+Players connect, pick a nickname, then create or join two-player rooms,
+chat, choose characters and relay their inputs through the room. Every
+connection and every room lives on one asyncio event loop: a connection is
+a ClientConnection protocol object rather than a thread blocked in recv(),
+so thousands of idle players cost a few KB each, and since the message
+handlers and the room cleanup run on that same loop they never race over
+the room list.
+
+Usage:
+    python room_server.py [host] [port]     - defaults: localhost 12345
+"""
+import asyncio
 import time
 import random
 import string
+import controls
+from framing import FramingError, MessageReader, encode
+
+CLIENT_BUFFER_SIZE = 4096  # receive buffer each connection starts with (grows for larger messages)
+MAX_PENDING_SEND = 1024 * 1024  # bytes queued for a client that isn't reading before it is dropped
+LISTEN_BACKLOG = 1024
+CLEANUP_INTERVAL = 30  # seconds between empty room checks
 
 class Room:
     def __init__(self, room_id, room_name, host_conn, room_code=None, max_players=2):
@@ -59,13 +78,14 @@ class Room:
         return count
     
     def broadcast_to_room(self, data, exclude_conn=None):
+        try:
+            frame = encode(data)  # once for everyone in the room
+        except Exception as e:
+            print(f"Failed to send data to room {self.room_id}: {e}")
+            return
         for role, player in self.players.items():
             if player['conn'] and player['conn'] != exclude_conn:
-                try:
-                    serialized_data = pickle.dumps(data)
-                    player['conn'].send(serialized_data)
-                except Exception as e:
-                    print(f"Failed to send data to {role}: {e}")
+                player['conn'].send_frame(frame)
     
     def get_room_info(self):
         return {
@@ -80,75 +100,119 @@ class Room:
             'phase': self.game_state['phase']
         }
 
+def raise_open_file_limit():
+    """Allow as many connections as the system hard limit (the soft limit is often only 1024)"""
+    try:
+        import resource
+    except ImportError:
+        return  # Windows has no per-process descriptor limit
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError) as e:
+            print(f"Could not raise the open file limit ({soft}): {e}")
+
+
+class ClientConnection(asyncio.BufferedProtocol):
+    """One player's connection; asyncio reads straight into its MessageReader buffer"""
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.client_id = None
+        self.reader = MessageReader(CLIENT_BUFFER_SIZE)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.client_id = self.server.connect_client(self, transport.get_extra_info('peername'))
+
+    def get_buffer(self, sizehint):
+        return self.reader.read_buffer()
+
+    def buffer_updated(self, nbytes):
+        try:
+            messages = self.reader.received(nbytes)
+        except FramingError as e:
+            print(f"Error handling client {self.client_id}: {e}")
+            self.transport.close()
+            return
+        for message in messages:
+            try:
+                self.server.process_client_message(self.client_id, message)
+            except Exception as e:
+                print(f"Error processing message from {self.client_id}: {e}")
+
+    def connection_lost(self, exc):
+        self.server.disconnect_client(self.client_id)
+
+    def send_frame(self, frame):
+        """Queue an encoded frame; the loop writes it as the socket allows"""
+        if self.transport.is_closing():
+            return
+        self.transport.write(frame)
+        if self.transport.get_write_buffer_size() > MAX_PENDING_SEND:
+            print(f"Dropping client {self.client_id}: not reading its messages")
+            self.transport.abort()
+
+    def send(self, message):
+        try:
+            self.send_frame(encode(message))
+        except Exception as e:
+            print(f"Failed to send data to {self.client_id}: {e}")
+
+    def close(self):
+        if self.transport:
+            self.transport.close()
+
+
 class RoomServer:
     def __init__(self, host='localhost', port=12345):
         self.host = host
         self.port = port
-        self.socket = None
+        self.server = None
+        self.loop = None
         self.clients = {}
         self.rooms = {}
         self.room_counter = 0
         self.running = True
         
     def start(self):
+        """Serve until close() is called (or Ctrl+C)"""
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.socket.bind((self.host, self.port))
-            self.socket.listen(20)
-            print(f"Room server started on {self.host}:{self.port}")
-            
-            # Start room cleanup thread
-            cleanup_thread = threading.Thread(target=self.cleanup_empty_rooms)
-            cleanup_thread.daemon = True
-            cleanup_thread.start()
-            
-            while self.running:
-                try:
-                    client_socket, client_address = self.socket.accept()
-                    print(f"New client connected: {client_address}")
-                    
-                    client_thread = threading.Thread(
-                        target=self.handle_client,
-                        args=(client_socket, client_address)
-                    )
-                    client_thread.daemon = True
-                    client_thread.start()
-                    
-                except Exception as e:
-                    if self.running:
-                        print(f"Error accepting connection: {e}")
-                        
+            asyncio.run(self.serve())
         except Exception as e:
             print(f"Error starting server: {e}")
+    
+    async def serve(self):
+        raise_open_file_limit()
+        self.loop = asyncio.get_running_loop()
+        self.server = await self.loop.create_server(
+            lambda: ClientConnection(self), self.host, self.port,
+            backlog=LISTEN_BACKLOG, reuse_address=True)
+        print(f"Room server started on {self.host}:{self.port}")
+        
+        # Room cleanup runs on the same loop as the message handlers
+        cleanup_task = asyncio.create_task(self.cleanup_empty_rooms())
+        try:
+            await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass  # close() stopped the server
         finally:
-            self.close()
+            cleanup_task.cancel()
+            for client in list(self.clients.values()):
+                client['conn'].close()
     
-    def handle_client(self, client_socket, client_address):
+    def connect_client(self, conn, client_address):
         client_id = f"{client_address[0]}:{client_address[1]}:{time.time()}"
+        print(f"New client connected: {client_address}")
         self.clients[client_id] = {
-            'socket': client_socket,
+            'conn': conn,
             'address': client_address,
             'room_id': None,
             'nickname': f"Player_{client_id[-4:]}"
         }
-        
-        try:
-            while self.running:
-                data = client_socket.recv(4096)
-                if not data:
-                    break
-                    
-                try:
-                    message = pickle.loads(data)
-                    self.process_client_message(client_id, message)
-                except Exception as e:
-                    print(f"Error processing message from {client_id}: {e}")
-                    
-        except Exception as e:
-            print(f"Error handling client {client_id}: {e}")
-        finally:
-            self.disconnect_client(client_id)
+        return client_id
     
     def process_client_message(self, client_id, message):
         msg_type = message.get('type')
@@ -199,7 +263,7 @@ class RoomServer:
         room_id = f"room_{self.room_counter}"
         
         room_name = message.get('room_name', f"{client['nickname']}'s Room")
-        room = Room(room_id, room_name, client['socket'])
+        room = Room(room_id, room_name, client['conn'])
         room.players['host']['nickname'] = client['nickname']
         room.is_private = message.get('is_private', False)
         
@@ -232,7 +296,7 @@ class RoomServer:
         if client['room_id']:
             self.leave_room(client_id)
         
-        if room.add_player(client['socket'], client['nickname']):
+        if room.add_player(client['conn'], client['nickname']):
             client['room_id'] = room_id
             
             # Notify both players
@@ -272,7 +336,7 @@ class RoomServer:
         
         room = self.rooms[room_id]
         
-        if room.remove_player(client['socket']):
+        if room.remove_player(client['conn']):
             client['room_id'] = None
             
             # Notify remaining players
@@ -322,7 +386,7 @@ class RoomServer:
             room = self.rooms[room_id]
             
             # Find player role
-            role = 'host' if room.players['host']['conn'] == client['socket'] else 'guest'
+            role = 'host' if room.players['host']['conn'] == client['conn'] else 'guest'
             room.players[role]['character'] = message.get('character')
             
             # Broadcast character selection
@@ -340,7 +404,7 @@ class RoomServer:
             room = self.rooms[room_id]
             
             # Find player role
-            role = 'host' if room.players['host']['conn'] == client['socket'] else 'guest'
+            role = 'host' if room.players['host']['conn'] == client['conn'] else 'guest'
             room.players[role]['ready'] = message.get('ready', False)
             
             # Check if both players are ready
@@ -362,8 +426,9 @@ class RoomServer:
                     'type': 'game_start',
                     'background': selected_background,
                     'players': {
-                        'host': room.players['host'],
-                        'guest': room.players['guest']
+                        role: {'character': player['character'], 'nickname': player['nickname'],
+                               'ready': player['ready']}
+                        for role, player in room.players.items()
                     }
                 })
     
@@ -375,24 +440,20 @@ class RoomServer:
             room = self.rooms[room_id]
             
             # Find player role
-            role = 'host' if room.players['host']['conn'] == client['socket'] else 'guest'
+            role = 'host' if room.players['host']['conn'] == client['conn'] else 'guest'
             
             # Broadcast input to other player
             room.broadcast_to_room({
                 'type': 'opponent_input',
                 'role': role,
-                'input': message.get('input', {}),
+                'input': message.get('input', controls.pack(controls.NO_INPUT)),
                 'game_state': message.get('game_state', {})
-            }, exclude_conn=client['socket'])
+            }, exclude_conn=client['conn'])
     
     def send_to_client(self, client_id, data):
         client = self.clients.get(client_id)
         if client:
-            try:
-                serialized_data = pickle.dumps(data)
-                client['socket'].send(serialized_data)
-            except Exception as e:
-                print(f"Failed to send data to {client_id}: {e}")
+            client['conn'].send(data)
     
     def disconnect_client(self, client_id):
         if client_id in self.clients:
@@ -402,17 +463,13 @@ class RoomServer:
             if client['room_id']:
                 self.leave_room(client_id)
             
-            try:
-                client['socket'].close()
-            except:
-                pass
-                
+            client['conn'].close()
             del self.clients[client_id]
             print(f"Client {client_id} disconnected")
     
-    def cleanup_empty_rooms(self):
+    async def cleanup_empty_rooms(self):
         while self.running:
-            time.sleep(30)  # Check every 30 seconds
+            await asyncio.sleep(CLEANUP_INTERVAL)
             empty_rooms = []
             
             for room_id, room in self.rooms.items():
@@ -427,14 +484,13 @@ class RoomServer:
                     print(f"Cleaned up empty room: {room_id}")
     
     def close(self):
+        """Stop the server; safe to call from another thread"""
         self.running = False
-        for client in self.clients.values():
+        if self.server:
             try:
-                client['socket'].close()
-            except:
-                pass
-        if self.socket:
-            self.socket.close()
+                self.loop.call_soon_threadsafe(self.server.close)
+            except RuntimeError:
+                pass  # the loop has already finished
 
 if __name__ == "__main__":
     import sys
@@ -1,15 +1,33 @@
+"""
+Matchmaking game server
+
+Pairs players in the order they connect and relays their character picks,
+inputs and state within each two-player session. One thread serves every
+connection: sockets are non-blocking and a selector (epoll on Linux) says
+which ones can be read or written, so each pass of the loop handles every
+ready socket. Each connection has a ClientConnection holding its session
+and player number, so nothing is looked up per message.
+
+Usage:
+    python server.py [host] [port]     - defaults: localhost 12345
+"""
+import collections
+import selectors
 import socket
-import threading
-import pickle
 import time
 import json
+import controls
+from framing import FramingError, MessageReader, encode
+from room_server import CLIENT_BUFFER_SIZE, LISTEN_BACKLOG, MAX_PENDING_SEND, raise_open_file_limit
+
+SELECT_TIMEOUT = 1.0  # seconds; how quickly the loop notices close()
 
 class GameSession:
     def __init__(self, session_id, player1_conn, player2_conn):
         self.session_id = session_id
         self.players = {
-            1: {'conn': player1_conn, 'ready': False, 'character': None, 'input': {}},
-            2: {'conn': player2_conn, 'ready': False, 'character': None, 'input': {}}
+            1: {'conn': player1_conn, 'ready': False, 'character': None, 'input': controls.pack(controls.NO_INPUT)},
+            2: {'conn': player2_conn, 'ready': False, 'character': None, 'input': controls.pack(controls.NO_INPUT)}
         }
         self.game_state = {
             'phase': 'character_select',  # character_select, playing, finished
@@ -20,14 +38,15 @@ class GameSession:
         self.running = True
         
     def broadcast_to_players(self, data, exclude_player=None):
+        try:
+            frame = encode(data)  # once for both players
+        except Exception as e:
+            print(f"Failed to send data to session {self.session_id}: {e}")
+            return
         for player_id, player in self.players.items():
             if exclude_player and player_id == exclude_player:
                 continue
-            try:
-                serialized_data = pickle.dumps(data)
-                player['conn'].send(serialized_data)
-            except:
-                print(f"Failed to send data to player {player_id}")
+            player['conn'].send_frame(frame)
     
     def handle_player_data(self, player_id, data):
         if data['type'] == 'character_select':
@@ -66,92 +85,181 @@ class GameSession:
                 'state': data['state']
             }, exclude_player=player_id)
 
+class ClientConnection:
+    """One player's non-blocking socket, with their session and player number once matched"""
+
+    def __init__(self, server, sock, address):
+        self.server = server
+        self.socket = sock
+        self.address = address
+        self.client_id = f"{address[0]}:{address[1]}"
+        self.reader = MessageReader(CLIENT_BUFFER_SIZE)
+        self.outgoing = bytearray()  # frames the socket hasn't taken yet
+        self.session = None
+        self.player_number = None
+        self.closed = False
+
+    def fileno(self):
+        return self.socket.fileno()
+
+    def read(self):
+        """Receive what is waiting and handle the messages it completes"""
+        try:
+            received = self.socket.recv_into(self.reader.read_buffer())
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            print(f"Error handling client {self.client_id}: {e}")
+            self.server.disconnect_client(self)
+            return
+        if not received:
+            self.server.disconnect_client(self)
+            return
+        try:
+            messages = self.reader.received(received)
+        except FramingError as e:
+            print(f"Error handling client {self.client_id}: {e}")
+            self.server.disconnect_client(self)
+            return
+        for message in messages:
+            if self.closed:
+                break
+            try:
+                self.server.process_client_message(self, message)
+            except Exception as e:
+                print(f"Error processing message from {self.client_id}: {e}")
+
+    def send_frame(self, frame):
+        """Send an encoded frame now if the socket takes it, else queue it for the loop"""
+        if self.closed:
+            return
+        if not self.outgoing:
+            try:
+                sent = self.socket.send(frame)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError as e:
+                print(f"Failed to send data to {self.client_id}: {e}")
+                self.server.disconnect_client(self)
+                return
+            if sent == len(frame):
+                return
+            frame = frame[sent:]
+            self.server.selector.modify(self, selectors.EVENT_READ | selectors.EVENT_WRITE)
+        self.outgoing += frame
+        if len(self.outgoing) > MAX_PENDING_SEND:
+            print(f"Dropping client {self.client_id}: not reading its messages")
+            self.server.disconnect_client(self)
+
+    def send(self, message):
+        try:
+            self.send_frame(encode(message))
+        except Exception as e:
+            print(f"Failed to send data to {self.client_id}: {e}")
+
+    def flush(self):
+        """Write queued frames once the socket has room again"""
+        try:
+            sent = self.socket.send(self.outgoing)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            print(f"Failed to send data to {self.client_id}: {e}")
+            self.server.disconnect_client(self)
+            return
+        del self.outgoing[:sent]
+        if not self.outgoing:
+            self.server.selector.modify(self, selectors.EVENT_READ)
+
+    def close(self):
+        self.closed = True
+        try:
+            self.socket.close()
+        except OSError:
+            pass
+
+
 class GameServer:
     def __init__(self, host='localhost', port=12345):
         self.host = host
         self.port = port
         self.socket = None
+        self.selector = None
         self.clients = {}
-        self.waiting_clients = []
+        self.waiting_clients = collections.deque()
         self.game_sessions = {}
         self.session_counter = 0
         self.running = True
         
     def start(self):
+        """Serve every connection from this thread until close() is called"""
         try:
+            raise_open_file_limit()
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.socket.bind((self.host, self.port))
-            self.socket.listen(10)
+            self.socket.listen(LISTEN_BACKLOG)
+            self.socket.setblocking(False)
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(self.socket, selectors.EVENT_READ)
             print(f"Game server started on {self.host}:{self.port}")
             
             while self.running:
-                try:
-                    client_socket, client_address = self.socket.accept()
-                    print(f"New client connected: {client_address}")
-                    
-                    client_thread = threading.Thread(
-                        target=self.handle_client,
-                        args=(client_socket, client_address)
-                    )
-                    client_thread.daemon = True
-                    client_thread.start()
-                    
-                except Exception as e:
-                    if self.running:
-                        print(f"Error accepting connection: {e}")
+                for key, events in self.selector.select(SELECT_TIMEOUT):
+                    conn = key.fileobj
+                    if conn is self.socket:
+                        self.accept_clients()
+                        continue
+                    try:
+                        if events & selectors.EVENT_WRITE and not conn.closed:
+                            conn.flush()
+                        if events & selectors.EVENT_READ and not conn.closed:
+                            conn.read()
+                    except Exception as e:
+                        # One client's failure must not stop the server
+                        print(f"Error handling client {conn.client_id}: {e}")
+                        self.disconnect_client(conn)
                         
         except Exception as e:
             print(f"Error starting server: {e}")
         finally:
-            self.close()
+            self.shutdown()
     
-    def handle_client(self, client_socket, client_address):
-        client_id = f"{client_address[0]}:{client_address[1]}"
-        self.clients[client_id] = {
-            'socket': client_socket,
-            'address': client_address,
-            'session': None
-        }
-        
-        # Add to waiting list for matchmaking
-        self.waiting_clients.append(client_id)
-        self.try_matchmaking()
-        
-        try:
-            while self.running:
-                data = client_socket.recv(4096)
-                if not data:
-                    break
-                    
-                try:
-                    message = pickle.loads(data)
-                    self.process_client_message(client_id, message)
-                except Exception as e:
-                    print(f"Error processing message from {client_id}: {e}")
-                    
-        except Exception as e:
-            print(f"Error handling client {client_id}: {e}")
-        finally:
-            self.disconnect_client(client_id)
+    def accept_clients(self):
+        """Accept every connection waiting on the listening socket"""
+        while True:
+            try:
+                client_socket, client_address = self.socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                print(f"Error accepting connection: {e}")
+                return
+            print(f"New client connected: {client_address}")
+            client_socket.setblocking(False)
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = ClientConnection(self, client_socket, client_address)
+            self.clients[conn.client_id] = conn
+            self.selector.register(conn, selectors.EVENT_READ)
+            
+            # Add to waiting list for matchmaking
+            self.waiting_clients.append(conn)
+            self.try_matchmaking()
     
     def try_matchmaking(self):
-        if len(self.waiting_clients) >= 2:
-            player1_id = self.waiting_clients.pop(0)
-            player2_id = self.waiting_clients.pop(0)
+        while len(self.waiting_clients) >= 2:
+            player1 = self.waiting_clients.popleft()
+            player2 = self.waiting_clients.popleft()
             
             self.session_counter += 1
             session_id = f"session_{self.session_counter}"
             
-            player1_conn = self.clients[player1_id]['socket']
-            player2_conn = self.clients[player2_id]['socket']
-            
-            session = GameSession(session_id, player1_conn, player2_conn)
+            session = GameSession(session_id, player1, player2)
             self.game_sessions[session_id] = session
             
             # Assign clients to session
-            self.clients[player1_id]['session'] = session_id
-            self.clients[player2_id]['session'] = session_id
+            player1.session, player1.player_number = session, 1
+            player2.session, player2.player_number = session, 2
             
             # Notify players about match found
             match_data = {
@@ -159,78 +267,53 @@ class GameServer:
                 'session_id': session_id,
                 'player_number': 1
             }
-            self.send_to_client(player1_id, match_data)
+            player1.send(match_data)
             
             match_data['player_number'] = 2
-            self.send_to_client(player2_id, match_data)
+            player2.send(match_data)
             
-            print(f"Created game session {session_id} for {player1_id} vs {player2_id}")
+            print(f"Created game session {session_id} for {player1.client_id} vs {player2.client_id}")
     
-    def process_client_message(self, client_id, message):
-        client = self.clients.get(client_id)
-        if not client:
-            return
-            
-        session_id = client['session']
-        if not session_id or session_id not in self.game_sessions:
+    def process_client_message(self, conn, message):
+        if conn.session and conn.session.running:
+            conn.session.handle_player_data(conn.player_number, message)
+    
+    def disconnect_client(self, conn):
+        if conn.closed:
             return
-            
-        session = self.game_sessions[session_id]
+        self.selector.unregister(conn)
+        conn.close()
+        self.clients.pop(conn.client_id, None)
         
-        # Determine player number
-        player_number = 1 if session.players[1]['conn'] == client['socket'] else 2
+        # Remove from waiting list
+        if conn in self.waiting_clients:
+            self.waiting_clients.remove(conn)
         
-        session.handle_player_data(player_number, message)
-    
-    def send_to_client(self, client_id, data):
-        client = self.clients.get(client_id)
-        if client:
-            try:
-                serialized_data = pickle.dumps(data)
-                client['socket'].send(serialized_data)
-            except Exception as e:
-                print(f"Failed to send data to {client_id}: {e}")
-    
-    def disconnect_client(self, client_id):
-        if client_id in self.clients:
-            client = self.clients[client_id]
-            session_id = client['session']
+        # Handle session cleanup; taken out first, since notifying the other
+        # player can disconnect them too and come back here
+        session = conn.session and self.game_sessions.pop(conn.session.session_id, None)
+        if session:
+            session.running = False
             
-            # Remove from waiting list
-            if client_id in self.waiting_clients:
-                self.waiting_clients.remove(client_id)
-            
-            # Handle session cleanup
-            if session_id and session_id in self.game_sessions:
-                session = self.game_sessions[session_id]
-                session.running = False
-                
-                # Notify other player
-                for player_id, player in session.players.items():
-                    if player['conn'] != client['socket']:
-                        try:
-                            self.send_to_client(client_id, {'type': 'opponent_disconnected'})
-                        except:
-                            pass
-                
-                del self.game_sessions[session_id]
-            
-            # Close socket
-            try:
-                client['socket'].close()
-            except:
-                pass
-                
-            del self.clients[client_id]
-            print(f"Client {client_id} disconnected")
+            # Notify other player
+            for player_id, player in session.players.items():
+                if player['conn'] is not conn:
+                    player['conn'].send({'type': 'opponent_disconnected'})
+        
+        print(f"Client {conn.client_id} disconnected")
     
     def close(self):
+        """Stop the server; safe to call from another thread (the loop notices within SELECT_TIMEOUT)"""
         self.running = False
-        for client in self.clients.values():
-            try:
-                client['socket'].close()
-            except:
-                pass
+    
+    def shutdown(self):
+        """Close every connection and the listening socket, from the loop's own thread"""
+        self.running = False
+        for conn in list(self.clients.values()):
+            conn.close()
+        self.clients.clear()
+        if self.selector:
+            self.selector.close()
         if self.socket:
             self.socket.close()
 
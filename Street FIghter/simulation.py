@@ -0,0 +1,363 @@
+"""
+Headless fight simulation core for Street Fighter
+
+Holds the rules that used to live in Fighter.move / Fighter.update as plain
+Python with no pygame dependency, so the same code can drive the game
+clients, the room server and batch tools. Rendering lives in fighter.py.
+"""
+import struct
+
+from controls import (INPUT_ATTACK1, INPUT_ATTACK2, INPUT_JUMP, INPUT_LEFT, INPUT_RIGHT,
+                      INPUT_SKILLS, NO_INPUT)
+from skills import SKILL_COOLDOWN, SKILL_DAMAGE, SKILL_HIT_OFFSET, SKILL_RANGE, resolve_skills
+
+# Arena defaults (match the 1000x600 game window)
+SCREEN_WIDTH = 1000
+SCREEN_HEIGHT = 600
+FLOOR_MARGIN = 110  # distance from the bottom of the screen to the floor
+
+# Movement and combat tuning
+SPEED = 10
+GRAVITY = 2
+JUMP_VELOCITY = -30
+FIGHTER_WIDTH = 80
+FIGHTER_HEIGHT = 180
+ATTACK_DAMAGE = 10
+ATTACK_COOLDOWN = 20
+ANIMATION_TICKS = 3  # simulation ticks per animation frame (50 ms at 60 FPS)
+
+# Actions (rows of the animation list)
+IDLE = 0
+RUN = 1
+JUMP = 2
+ATTACK1 = 3
+ATTACK2 = 4
+HIT = 5
+DEATH = 6
+SPECIAL1 = 7
+SPECIAL2 = 8
+
+
+def rects_collide(ax, ay, aw, ah, bx, by, bw, bh):
+    """Same overlap rule as pygame.Rect.colliderect"""
+    return (aw > 0 and ah > 0 and bw > 0 and bh > 0 and
+            ax < bx + bw and bx < ax + aw and
+            ay < by + bh and by < ay + ah)
+
+
+# Per-frame fighter fields packed by FighterState.snapshot_into(), in this order:
+# x, y, vel_y, health, action, frame_index, frame_timer, attack_type,
+# attack_cooldown, special_type, 4 special cooldowns, then the flags flip,
+# running, jump, attacking, attack_started, hit, alive, using_special
+FIGHTER_STRUCT = struct.Struct('<14i8?')
+# Match header: frame, round_over (followed by both fighters)
+MATCH_STRUCT = struct.Struct('<i?')
+MATCH_SNAPSHOT_SIZE = MATCH_STRUCT.size + 2 * FIGHTER_STRUCT.size
+
+
+class FighterState:
+    """Simulation-relevant state of a single fighter"""
+
+    __slots__ = ('player', 'x', 'y', 'width', 'height', 'flip', 'frame_counts', 'action',
+                 'frame_index', 'frame_timer', 'vel_y', 'running', 'jump', 'attacking',
+                 'attack_type', 'attack_cooldown', 'attack_started', 'hit', 'health', 'alive',
+                 'special_skills', 'skill_ids', 'special_cooldowns', 'using_special',
+                 'special_type')
+
+    def __init__(self, player, x, y, flip, frame_counts, special_skills=None):
+        self.player = player
+        self.x = x
+        self.y = y
+        self.width = FIGHTER_WIDTH
+        self.height = FIGHTER_HEIGHT
+        self.flip = flip
+        self.frame_counts = list(frame_counts)  # animation length per action
+        self.action = IDLE
+        self.frame_index = 0
+        self.frame_timer = 0  # ticks the current animation frame has been shown
+        self.vel_y = 0
+        self.running = False
+        self.jump = False
+        self.attacking = False
+        self.attack_type = 0
+        self.attack_cooldown = 0
+        self.attack_started = False  # set on frames where an attack/skill fires (sound cue)
+        self.hit = False
+        self.health = 100
+        self.alive = True
+        self.special_skills = special_skills or []
+        self.skill_ids = resolve_skills(self.special_skills)  # registry ids, resolved once
+        self.special_cooldowns = [0, 0, 0, 0]  # Cooldowns for up to 4 special skills
+        self.using_special = False
+        self.special_type = 0
+
+    @property
+    def centerx(self):
+        return self.x + self.width // 2
+
+    @property
+    def right(self):
+        return self.x + self.width
+
+    @property
+    def bottom(self):
+        return self.y + self.height
+
+    def frame_count(self, action):
+        """Number of animation frames for an action (falls back to idle if missing)"""
+        if action < len(self.frame_counts):
+            return self.frame_counts[action]
+        return self.frame_counts[IDLE]
+
+    def snapshot(self):
+        """Per-frame state as FIGHTER_STRUCT bytes (player, size and skills are fixed)"""
+        buffer = bytearray(FIGHTER_STRUCT.size)
+        self.snapshot_into(buffer)
+        return bytes(buffer)
+
+    def snapshot_into(self, buffer, offset=0):
+        """Pack the per-frame state into a preallocated buffer"""
+        cooldowns = self.special_cooldowns
+        FIGHTER_STRUCT.pack_into(buffer, offset,
+                                 self.x, self.y, self.vel_y, self.health, self.action,
+                                 self.frame_index, self.frame_timer, self.attack_type,
+                                 self.attack_cooldown, self.special_type,
+                                 cooldowns[0], cooldowns[1], cooldowns[2], cooldowns[3],
+                                 self.flip, self.running, self.jump, self.attacking,
+                                 self.attack_started, self.hit, self.alive, self.using_special)
+
+    def restore(self, buffer, offset=0):
+        """Load state packed by snapshot() / snapshot_into()"""
+        cooldowns = self.special_cooldowns
+        (self.x, self.y, self.vel_y, self.health, self.action,
+         self.frame_index, self.frame_timer, self.attack_type,
+         self.attack_cooldown, self.special_type,
+         cooldowns[0], cooldowns[1], cooldowns[2], cooldowns[3],
+         self.flip, self.running, self.jump, self.attacking,
+         self.attack_started, self.hit, self.alive, self.using_special) = FIGHTER_STRUCT.unpack_from(buffer, offset)
+
+
+class MatchState:
+    """Both fighters plus the match-level state stepped by step()"""
+
+    def __init__(self, fighter1, fighter2, screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT):
+        self.fighters = [fighter1, fighter2]
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.frame = 0
+        self.round_over = False
+
+    def winner(self):
+        """1 or 2 for the surviving player, 0 for a draw, None while both are alive"""
+        alive1 = self.fighters[0].alive
+        alive2 = self.fighters[1].alive
+        if alive1 and alive2:
+            return None
+        if alive1:
+            return 1
+        if alive2:
+            return 2
+        return 0
+
+    @property
+    def snapshot_size(self):
+        return MATCH_SNAPSHOT_SIZE
+
+    def snapshot(self):
+        """Everything step() changes, as bytes for restore()"""
+        buffer = bytearray(self.snapshot_size)
+        self.snapshot_into(buffer)
+        return bytes(buffer)
+
+    def snapshot_into(self, buffer, offset=0):
+        """Pack the match into a preallocated buffer of snapshot_size bytes"""
+        MATCH_STRUCT.pack_into(buffer, offset, self.frame, self.round_over)
+        offset += MATCH_STRUCT.size
+        for fighter in self.fighters:
+            fighter.snapshot_into(buffer, offset)
+            offset += FIGHTER_STRUCT.size
+
+    def restore(self, buffer, offset=0):
+        """Go back to a snapshot in place, so Fighter.state references stay valid"""
+        self.frame, self.round_over = MATCH_STRUCT.unpack_from(buffer, offset)
+        offset += MATCH_STRUCT.size
+        for fighter in self.fighters:
+            fighter.restore(buffer, offset)
+            offset += FIGHTER_STRUCT.size
+
+
+def step(state, p1_input, p2_input):
+    """Advance the match by one simulation tick and return it
+
+    p1_input / p2_input are input bitmasks (see controls.py).
+    Everything, animation included, is counted in ticks, so the same inputs
+    always give the same result no matter how fast the caller runs.
+    """
+    fighter1, fighter2 = state.fighters
+    move(fighter1, fighter2, p1_input or NO_INPUT, state.round_over, state.screen_width, state.screen_height)
+    move(fighter2, fighter1, p2_input or NO_INPUT, state.round_over, state.screen_width, state.screen_height)
+    update(fighter1)
+    update(fighter2)
+    state.frame += 1
+    return state
+
+
+def move(fighter, target, input_mask, round_over, screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT):
+    """Apply one frame of input, physics and cooldowns to a fighter"""
+    dx = 0
+    dy = 0
+    fighter.running = False
+    fighter.attack_type = 0
+    fighter.attack_started = False
+
+    #can only perform other actions if not currently attacking
+    if not fighter.attacking and fighter.alive and not round_over and not fighter.using_special:
+        #movement
+        if input_mask & INPUT_LEFT:
+            dx = -SPEED
+            fighter.running = True
+        if input_mask & INPUT_RIGHT:
+            dx = SPEED
+            fighter.running = True
+        #jump
+        if input_mask & INPUT_JUMP and not fighter.jump:
+            fighter.vel_y = JUMP_VELOCITY
+            fighter.jump = True
+        #basic attacks
+        if input_mask & (INPUT_ATTACK1 | INPUT_ATTACK2):
+            attack(fighter, target)
+            if input_mask & INPUT_ATTACK1:
+                fighter.attack_type = 1
+            if input_mask & INPUT_ATTACK2:
+                fighter.attack_type = 2
+        #special skills, one input bit per available skill slot
+        for skill_index, skill_bit in enumerate(INPUT_SKILLS):
+            if input_mask & skill_bit and len(fighter.skill_ids) > skill_index:
+                use_special_skill(fighter, target, skill_index)
+
+    #apply gravity
+    fighter.vel_y += GRAVITY
+    dy += fighter.vel_y
+
+    #ensure player stays on screen
+    if fighter.x + dx < 0:
+        dx = -fighter.x
+    if fighter.right + dx > screen_width:
+        dx = screen_width - fighter.right
+    if fighter.bottom + dy > screen_height - FLOOR_MARGIN:
+        fighter.vel_y = 0
+        fighter.jump = False
+        dy = screen_height - FLOOR_MARGIN - fighter.bottom
+
+    #ensure players face each other
+    fighter.flip = not target.centerx > fighter.centerx
+
+    #apply attack cooldown
+    if fighter.attack_cooldown > 0:
+        fighter.attack_cooldown -= 1
+
+    #apply special skill cooldowns
+    cooldowns = fighter.special_cooldowns
+    for i in range(len(cooldowns)):
+        if cooldowns[i] > 0:
+            cooldowns[i] -= 1
+
+    #update player position
+    fighter.x += dx
+    fighter.y += dy
+
+
+def attack(fighter, target):
+    """Basic attack: a box two bodies wide in front of the fighter"""
+    if fighter.attack_cooldown == 0:
+        fighter.attacking = True
+        fighter.attack_started = True
+        width = 2 * fighter.width
+        if rects_collide(fighter.centerx - width * fighter.flip, fighter.y, width, fighter.height,
+                         target.x, target.y, target.width, target.height):
+            target.health -= ATTACK_DAMAGE
+            target.hit = True
+
+
+def use_special_skill(fighter, target, skill_index):
+    if (skill_index < len(fighter.skill_ids) and
+            fighter.special_cooldowns[skill_index] == 0 and
+            not fighter.using_special):
+
+        fighter.using_special = True
+        fighter.special_type = skill_index + 1
+        fighter.attack_started = True
+
+        # Skill effects come precompiled from the registry in skills.py
+        skill = fighter.skill_ids[skill_index]
+        if rects_collide(fighter.centerx + SKILL_HIT_OFFSET[skill][fighter.flip], fighter.y,
+                         SKILL_RANGE[skill], fighter.height,
+                         target.x, target.y, target.width, target.height):
+            target.health -= SKILL_DAMAGE[skill]
+            target.hit = True
+
+        fighter.special_cooldowns[skill_index] = SKILL_COOLDOWN[skill]
+
+
+def update(fighter):
+    """Advance the fighter's action state machine and animation frame"""
+    #check what action the player is performing
+    if fighter.health <= 0:
+        fighter.health = 0
+        fighter.alive = False
+        update_action(fighter, DEATH)
+    elif fighter.hit:
+        update_action(fighter, HIT)
+    elif fighter.using_special:
+        if fighter.special_type == 1:
+            update_action(fighter, SPECIAL1)
+        elif fighter.special_type == 2:
+            update_action(fighter, SPECIAL2)
+    elif fighter.attacking:
+        if fighter.attack_type == 1:
+            update_action(fighter, ATTACK1)
+        elif fighter.attack_type == 2:
+            update_action(fighter, ATTACK2)
+    elif fighter.jump:
+        update_action(fighter, JUMP)
+    elif fighter.running:
+        update_action(fighter, RUN)
+    else:
+        update_action(fighter, IDLE)
+
+    #advance the frame once it has been shown for ANIMATION_TICKS ticks
+    if fighter.frame_timer >= ANIMATION_TICKS:
+        fighter.frame_index += 1
+        fighter.frame_timer = 0
+    fighter.frame_timer += 1
+    #check if the animation has finished
+    frame_count = fighter.frame_count(fighter.action)
+    if fighter.frame_index >= frame_count:
+        #if the player is dead then end the animation
+        if not fighter.alive:
+            fighter.frame_index = frame_count - 1
+        else:
+            fighter.frame_index = 0
+            #check if an attack was executed
+            if fighter.action == ATTACK1 or fighter.action == ATTACK2:
+                fighter.attacking = False
+                fighter.attack_cooldown = ATTACK_COOLDOWN
+            #check if special skill was executed
+            if fighter.action == SPECIAL1 or fighter.action == SPECIAL2:
+                fighter.using_special = False
+            #check if damage was taken
+            if fighter.action == HIT:
+                fighter.hit = False
+                #if the player was in the middle of an attack, then the attack is stopped
+                fighter.attacking = False
+                fighter.using_special = False
+                fighter.attack_cooldown = ATTACK_COOLDOWN
+
+
+def update_action(fighter, new_action):
+    #check if the new action is different to the previous one
+    if new_action != fighter.action:
+        fighter.action = new_action
+        #update the animation settings
+        fighter.frame_index = 0
+        fighter.frame_timer = 0
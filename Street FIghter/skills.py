@@ -0,0 +1,119 @@
+"""
+Special skill registry for Street Fighter
+
+One table of every special skill, compiled once at import into flat
+per-skill lists indexed by skill id. Fighters resolve their skill names to
+ids when they are created, so the simulation hot path only does list
+lookups. Character rosters (which skills each character has) live here as
+well so the sprite loader and the select screen agree.
+"""
+
+SPECIAL_COOLDOWN = 300  # 5 seconds at 60 FPS
+
+# name: (damage, range width in pixels)
+SKILL_TABLE = {
+    # Kunoichi / Shinobi skills
+    'shadow_clone': (30, 140),
+    'ninja_vanish': (25, 120),
+    'shadow_strike': (25, 150),
+    'invisibility': (15, 100),
+    'smoke_bomb': (20, 120),
+    # Lightning Mage skills
+    'lightning_bolt': (35, 200),
+    'chain_lightning': (30, 180),
+    # Ninja Monk skills
+    'meditation': (15, 80),  # Healing/defense skill
+    'spirit_punch': (28, 160),
+    # Ninja Peasant skills
+    'farm_tools': (20, 110),
+    'humble_strike': (25, 130),
+    # Samurai skills
+    'katana_slash': (32, 110),
+    'honor_guard': (18, 90),
+    # Fire Wizard / wizard skills
+    'fireball': (28, 170),
+    'flame_jet': (26, 160),
+    'ice_shard': (22, 150),
+    # Wanderer Magician skills
+    'magic_arrow': (24, 140),
+    'arcane_sphere': (30, 180),
+    'magic_missile': (25, 160),
+    'teleport': (20, 100),
+    # Samurai Warrior / Commander skills
+    'blade_fury': (40, 130),
+    'warrior_spirit': (25, 120),
+    'battle_cry': (22, 140),
+    'tactical_strike': (28, 125),
+    # Samurai Archer skills
+    'arrow_rain': (24, 200),
+    'precision_shot': (35, 250),
+    # Warrior skills
+    'sword_slash': (26, 115),
+    'shield_bash': (22, 105),
+}
+
+DEFAULT_SKILL = 'default'  # effect used for names missing from SKILL_TABLE
+DEFAULT_EFFECT = (25, 130)
+
+# Skills per character, keyed by character_key()
+CHARACTER_SKILLS = {
+    'kunoichi': ('shadow_clone', 'ninja_vanish'),
+    'lightning_mage': ('lightning_bolt', 'chain_lightning'),
+    'ninja_monk': ('meditation', 'spirit_punch'),
+    'ninja_peasant': ('farm_tools', 'humble_strike'),
+    'samurai': ('katana_slash', 'honor_guard'),
+    'samurai_archer': ('arrow_rain', 'precision_shot'),
+    'samurai_commander': ('battle_cry', 'tactical_strike'),
+    'samurai_warrior': ('blade_fury', 'warrior_spirit'),
+    'shinobi': ('smoke_bomb', 'shadow_clone'),
+    'fire_wizard': ('fireball', 'flame_jet'),
+    'wanderer_magican': ('magic_arrow', 'arcane_sphere'),
+    'warrior': ('sword_slash', 'shield_bash'),
+    'wizard': ('fireball', 'ice_shard'),
+}
+DEFAULT_CHARACTER_SKILLS = ('basic_attack', 'power_strike')
+
+# Compiled registry: parallel lists indexed by skill id (id 0 is the default effect)
+SKILL_NAMES = [DEFAULT_SKILL]
+SKILL_DAMAGE = [DEFAULT_EFFECT[0]]
+SKILL_RANGE = [DEFAULT_EFFECT[1]]
+SKILL_COOLDOWN = [SPECIAL_COOLDOWN]
+# Hitbox x offset from the fighter's centre, indexed [skill_id][flip]
+SKILL_HIT_OFFSET = [(0, -DEFAULT_EFFECT[1])]
+SKILL_IDS = {DEFAULT_SKILL: 0}
+
+for _name, (_damage, _range_width) in SKILL_TABLE.items():
+    SKILL_IDS[_name] = len(SKILL_NAMES)
+    SKILL_NAMES.append(_name)
+    SKILL_DAMAGE.append(_damage)
+    SKILL_RANGE.append(_range_width)
+    SKILL_COOLDOWN.append(SPECIAL_COOLDOWN)
+    SKILL_HIT_OFFSET.append((0, -_range_width))
+
+
+def character_key(name):
+    """Normalise a character or folder name ('Lightning Mage', 'Lightning_Mage')"""
+    return name.lower().replace(' ', '_')
+
+
+def character_skills(name):
+    """Skill names for a character, falling back to the generic pair"""
+    return list(CHARACTER_SKILLS.get(character_key(name), DEFAULT_CHARACTER_SKILLS))
+
+
+_unknown_skills = set()  # names already warned about
+
+
+def skill_id(name):
+    """Registry id for a skill name; unknown names use the default effect"""
+    if name in SKILL_IDS:
+        return SKILL_IDS[name]
+    if name not in _unknown_skills:
+        _unknown_skills.add(name)
+        print(f"Unknown skill: {name} - using default effect")
+    return 0
+
+
+def resolve_skills(names):
+    """Resolve a fighter's skill names to registry ids"""
+    return [skill_id(name) for name in names]
@@ -1,12 +1,93 @@
 import pygame
 import os
 import json
+from skills import DEFAULT_CHARACTER_SKILLS, character_skills
+from image_cache import load_image
+from asset_manager import asset_bytes, asset_manager
+
+ATLAS_DIR = 'atlas'  # baked by bake_atlas.py
+ATLAS_VERSION = 1
+# Animation order: idle, run, jump, attack1, attack2, hurt, dead, special1, special2
+ANIMATION_ORDER = ['idle', 'run', 'jump', 'attack1', 'attack2', 'hurt', 'dead', 'special1', 'special2']
+
+
+def trim_frame(frame):
+    """Opaque part of a frame as a subsurface, and its (x, y) in the frame"""
+    rect = frame.get_bounding_rect()
+    if rect.width == 0 or rect.height == 0:
+        rect = pygame.Rect(0, 0, 1, 1)  # fully transparent frame
+    return frame.subsurface(rect), (rect.x, rect.y)
+
+
+def trim_animations(animation_list):
+    """Frames cropped to their opaque pixels, and each one's offset in its full frame
+    
+    Cropped frames are copies, so the padded originals can be freed. A
+    surface repeated in an animation is cropped once and stays shared.
+    """
+    trimmed = {}  # id(frame): (cropped frame, offset)
+    animations = []
+    offsets = []
+    for frames in animation_list:
+        for frame in frames:
+            if id(frame) not in trimmed:
+                cropped, offset = trim_frame(frame)
+                trimmed[id(frame)] = (frame if cropped.get_size() == frame.get_size() else cropped.copy(), offset)
+        animations.append([trimmed[id(frame)][0] for frame in frames])
+        offsets.append([trimmed[id(frame)][1] for frame in frames])
+    return animations, offsets
+
+
+class AnimationSet:
+    """Animation frames of one character in both facings
+    
+    Frames are stored facing right as loaded. The mirrored copy of an
+    animation is made the first time a flipped fighter shows it and kept, so
+    drawing a fighter is a plain blit.
+    
+    Frames may be trimmed to their opaque pixels; offsets then holds where
+    each one sits inside the full frame_width wide frame.
+    
+    asset_key is the asset manager entry the set is cached in, if any; the
+    mirrored copies are charged to it as they are made.
+    """
+    
+    def __init__(self, animations, offsets=None, frame_width=None, asset_key=None):
+        self.animations = animations  # [action][frame] -> Surface
+        self.flipped = [None] * len(animations)
+        self.offsets = offsets  # [action][frame] -> (x, y), None if untrimmed
+        self.frame_width = frame_width
+        self.asset_key = asset_key
+    
+    def __len__(self):
+        return len(self.animations)
+    
+    def frames(self, action, flip=False):
+        """Frames of an animation, mirrored if flip is set"""
+        if not flip:
+            return self.animations[action]
+        frames = self.flipped[action]
+        if frames is None:
+            frames = [pygame.transform.flip(frame, True, False) for frame in self.animations[action]]
+            self.flipped[action] = frames
+            if self.asset_key is not None:
+                asset_manager.grow(self.asset_key, asset_bytes(frames))
+        return frames
+    
+    def offset(self, action, index, flip=False):
+        """Where to draw a frame relative to the top left of the full frame"""
+        if self.offsets is None:
+            return (0, 0)
+        x, y = self.offsets[action][index]
+        if flip:
+            x = self.frame_width - x - self.animations[action][index].get_width()
+        return (x, y)
+
 
 class SpriteLoader:
     """Enhanced sprite loading system for Street Fighter characters"""
     
     def __init__(self):
-        self.loaded_sprites = {}  # Cache for loaded sprites
         self.character_configs = self._load_character_configs()
         
     def _load_character_configs(self):
@@ -29,7 +110,7 @@ class SpriteLoader:
                     'special2': 'Spine.png'
                 },
                 'frame_counts': [8, 8, 2, 6, 6, 4, 6, 6, 8],  # frames per animation
-                'special_skills': ['shadow_clone', 'ninja_vanish']
+                'special_skills': character_skills('Kunoichi')
             },
             'Lightning Mage': {
                 'folder': 'Lightning Mage',
@@ -48,7 +129,7 @@ class SpriteLoader:
                     'special2': 'Light_ball.png'
                 },
                 'frame_counts': [6, 8, 2, 7, 7, 4, 6, 8, 6],
-                'special_skills': ['lightning_bolt', 'chain_lightning']
+                'special_skills': character_skills('Lightning Mage')
             },
             'Ninja_Monk': {
                 'folder': 'Ninja_Monk',
@@ -67,7 +148,7 @@ class SpriteLoader:
                     'special2': 'Blade.png'
                 },
                 'frame_counts': [6, 8, 2, 6, 6, 4, 6, 8, 6],
-                'special_skills': ['meditation', 'spirit_punch']
+                'special_skills': character_skills('Ninja_Monk')
             },
             'Ninja_Peasant': {
                 'folder': 'Ninja_Peasant',
@@ -86,7 +167,7 @@ class SpriteLoader:
                     'special2': 'Shot.png'
                 },
                 'frame_counts': [6, 8, 2, 6, 6, 4, 6, 8, 6],
-                'special_skills': ['farm_tools', 'humble_strike']
+                'special_skills': character_skills('Ninja_Peasant')
             },
             'Samurai': {
                 'folder': 'Samurai/Sprites',
@@ -105,7 +186,7 @@ class SpriteLoader:
                     'special1': 'Shield.png'
                 },
                 'frame_counts': [8, 8, 2, 6, 6, 6, 4, 6, 8],
-                'special_skills': ['katana_slash', 'honor_guard']
+                'special_skills': character_skills('Samurai')
             },
             'Fire Wizard': {
                 'folder': 'Fire Wizard',
@@ -124,7 +205,7 @@ class SpriteLoader:
                     'special2': 'Fireball.png'
                 },
                 'frame_counts': [6, 8, 2, 7, 7, 4, 6, 8, 6],
-                'special_skills': ['fireball', 'flame_jet']
+                'special_skills': character_skills('Fire Wizard')
             },
             'Wanderer Magican': {
                 'folder': 'Wanderer Magican',
@@ -143,26 +224,27 @@ class SpriteLoader:
                     'special2': 'Magic_sphere.png'
                 },
                 'frame_counts': [6, 8, 2, 7, 7, 4, 6, 8, 6],
-                'special_skills': ['magic_arrow', 'arcane_sphere']
+                'special_skills': character_skills('Wanderer Magican')
             }
         }
         return configs
     
     def load_character_sprites(self, character_name):
-        """Load all sprites for a character"""
-        if character_name in self.loaded_sprites:
-            return self.loaded_sprites[character_name]
-        
+        """Load all sprites for a character (cached by the asset manager)"""
         if character_name not in self.character_configs:
             print(f"Warning: Character '{character_name}' not found in configs")
             return self._create_placeholder_sprites(character_name)
         
+        return asset_manager.get(('character sprites', character_name), self._load_character_sprites, character_name)
+    
+    def _load_character_sprites(self, character_name):
         config = self.character_configs[character_name]
         base_path = os.path.join("images", config['folder'])
         
         try:
-            sprite_data = self._load_sprites_from_folder(base_path, config)
-            self.loaded_sprites[character_name] = sprite_data
+            sprite_data = self._load_atlas(character_name, config)
+            if sprite_data is None:
+                sprite_data = self._load_sprites_from_folder(base_path, config)
             return sprite_data
         except Exception as e:
             print(f"Error loading sprites for {character_name}: {e}")
@@ -177,10 +259,7 @@ class SpriteLoader:
         
         animation_list = []
         
-        # Animation order: idle, run, jump, attack1, attack2, hurt, dead, special1, special2
-        animation_order = ['idle', 'run', 'jump', 'attack1', 'attack2', 'hurt', 'dead', 'special1', 'special2']
-        
-        for i, anim_type in enumerate(animation_order):
+        for i, anim_type in enumerate(ANIMATION_ORDER):
             frames = []
             
             if anim_type in animations:
@@ -190,7 +269,7 @@ class SpriteLoader:
                 if os.path.exists(sprite_path):
                     try:
                         # Load the sprite image
-                        sprite_img = pygame.image.load(sprite_path).convert_alpha()
+                        sprite_img = load_image(sprite_path, alpha=True)
                         
                         # Determine if it's a sprite sheet or single frame
                         img_width = sprite_img.get_width()
@@ -199,15 +278,13 @@ class SpriteLoader:
                         if img_width > size * 1.5:  # Likely a sprite sheet
                             frame_width = img_width // frame_count
                             for frame_idx in range(frame_count):
+                                # Scale straight out of the strip to the drawn size; this is the only copy made
                                 frame_rect = pygame.Rect(frame_idx * frame_width, 0, frame_width, sprite_img.get_height())
-                                frame_surface = pygame.Surface((frame_width, sprite_img.get_height()), pygame.SRCALPHA)
-                                frame_surface.blit(sprite_img, (0, 0), frame_rect)
-                                scaled_frame = pygame.transform.scale(frame_surface, (frame_width * scale, sprite_img.get_height() * scale))
+                                scaled_frame = pygame.transform.scale(sprite_img.subsurface(frame_rect), (size * scale, size * scale))
                                 frames.append(scaled_frame)
-                        else:  # Single frame, duplicate for animation
+                        else:  # Single frame, shown for every frame of the animation
                             scaled_sprite = pygame.transform.scale(sprite_img, (size * scale, size * scale))
-                            for _ in range(frame_count):
-                                frames.append(scaled_sprite.copy())
+                            frames = [scaled_sprite] * frame_count
                                 
                     except Exception as e:
                         print(f"Error loading {sprite_file}: {e}")
@@ -220,12 +297,49 @@ class SpriteLoader:
             
             animation_list.append(frames)
         
+        # Most of every frame is transparent padding; keep only what gets drawn
+        animation_list, offsets = trim_animations(animation_list)
         return {
             'animations': animation_list,
+            'offsets': offsets,
+            'frame_size': [size * scale, size * scale],
             'config': config,
             'frame_counts': frame_counts
         }
     
+    def _load_atlas(self, character_name, config):
+        """Sprite data from a baked atlas, or None if there is no up-to-date one"""
+        manifest_path = atlas_path(character_name, '.json')
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if (manifest.get('version') != ATLAS_VERSION or manifest['size'] != config['size']
+                or manifest['scale'] != config['scale'] or manifest['frame_counts'] != config['frame_counts']):
+            print(f"Atlas for {character_name} does not match its config, loading from images")
+            return None
+        for source, mtime in manifest['sources'].items():
+            if os.path.exists(source) and os.path.getmtime(source) > mtime:
+                print(f"Atlas for {character_name} is older than {source}, loading from images")
+                return None
+        
+        atlas = load_image(os.path.join(ATLAS_DIR, manifest['image']), alpha=True)
+        animation_list = []
+        offsets = []
+        for frames in manifest['animations']:
+            animation_list.append([atlas.subsurface(frame['rect']) for frame in frames])
+            offsets.append([tuple(frame['offset']) for frame in frames])
+        
+        return {
+            'animations': animation_list,
+            'offsets': offsets,
+            'frame_size': manifest['frame_size'],
+            'config': config,
+            'frame_counts': config['frame_counts']
+        }
+    
     def _create_placeholder_frames(self, size, count):
         """Create placeholder frames for missing sprites"""
         frames = []
@@ -254,7 +368,7 @@ class SpriteLoader:
             'size': 64,
             'scale': 3,
             'offset': [32, 32],
-            'special_skills': ['placeholder_skill_1', 'placeholder_skill_2']
+            'special_skills': list(DEFAULT_CHARACTER_SKILLS)
         }
         
         return {
@@ -263,6 +377,15 @@ class SpriteLoader:
             'frame_counts': frame_counts
         }
     
+    def get_character_animations(self, character_name):
+        """AnimationSet of a character's frames, already scaled, to pass to Fighter"""
+        sprite_data = self.load_character_sprites(character_name)
+        if 'animation_set' not in sprite_data:
+            frame_width = sprite_data['frame_size'][0] if 'frame_size' in sprite_data else None
+            sprite_data['animation_set'] = AnimationSet(sprite_data['animations'], sprite_data.get('offsets'), frame_width,
+                                                        ('character sprites', character_name))
+        return sprite_data['animation_set']
+    
     def get_character_data(self, character_name):
         """Get character configuration data"""
         if character_name in self.character_configs:
@@ -273,19 +396,36 @@ class SpriteLoader:
     
     def get_character_skills(self, character_name):
         """Get character special skills"""
-        if character_name in self.character_configs:
-            return self.character_configs[character_name]['special_skills']
-        else:
-            return ['unknown_skill_1', 'unknown_skill_2']
+        return character_skills(character_name)
     
     def get_available_characters(self):
         """Get list of available characters"""
         return list(self.character_configs.keys())
     
+    def get_animation_set(self, sprite_sheet, size, scale, animation_steps):
+        """Cut a sprite sheet into scaled frames, once per sheet and layout"""
+        key = ('animation set', sprite_sheet, size, scale, tuple(animation_steps))
+        return asset_manager.get(key, self._cut_sprite_sheet, key, sprite_sheet, size, scale, animation_steps)
+    
+    def _cut_sprite_sheet(self, key, sprite_sheet, size, scale, animation_steps):
+        animation_list = []
+        for y, animation in enumerate(animation_steps):
+            frames = []
+            for x in range(animation):
+                frame = sprite_sheet.subsurface(x * size, y * size, size, size)
+                frames.append(pygame.transform.scale(frame, (size * scale, size * scale)))
+            animation_list.append(frames)
+        animation_list, offsets = trim_animations(animation_list)
+        return AnimationSet(animation_list, offsets, size * scale, key)
+    
     def create_sprite_sheet_from_animations(self, character_name):
         """Create a traditional sprite sheet from loaded animations for compatibility"""
+        return asset_manager.get(('sprite sheet', character_name), self._build_sprite_sheet, character_name)
+    
+    def _build_sprite_sheet(self, character_name):
         sprite_data = self.load_character_sprites(character_name)
         animations = sprite_data['animations']
+        offsets = sprite_data.get('offsets')
         config = sprite_data['config']
         
         # Calculate sprite sheet dimensions
@@ -302,11 +442,21 @@ class SpriteLoader:
         for y, animation in enumerate(animations):
             for x, frame in enumerate(animation):
                 pos = (x * frame_size, y * frame_size)
-                # Scale frame to match expected size
-                scaled_frame = pygame.transform.scale(frame, (frame_size, frame_size))
-                sprite_sheet.blit(scaled_frame, pos)
+                if offsets:
+                    # Trimmed frame, put back where it sits in the full frame
+                    offset_x, offset_y = offsets[y][x]
+                    sprite_sheet.blit(frame, (pos[0] + offset_x, pos[1] + offset_y))
+                    continue
+                # Frames are loaded at this size already; placeholders may not be
+                if frame.get_size() != (frame_size, frame_size):
+                    frame = pygame.transform.scale(frame, (frame_size, frame_size))
+                sprite_sheet.blit(frame, pos)
         
         return sprite_sheet
 
+def atlas_path(character_name, extension):
+    """Path of a character's baked atlas image ('.png') or manifest ('.json')"""
+    return os.path.join(ATLAS_DIR, character_name + extension)
+
 # Global sprite loader instance
 sprite_loader = SpriteLoader()